@@ -1,6 +1,10 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Role, BusinessElement, AccessRule, Session
+from .hierarchy import creates_cycle
+from .models import (
+    User, Role, BusinessElement, AccessRule, Session, AuditEvent
+)
 
 
 @admin.register(User)
@@ -15,7 +19,9 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Personal info', {
-            'fields': ('first_name', 'last_name', 'patronymic', 'role')
+            'fields': (
+                'first_name', 'last_name', 'patronymic', 'role', 'roles'
+            )
         }),
         ('Permissions', {
             'fields': (
@@ -33,15 +39,38 @@ class CustomUserAdmin(UserAdmin):
             ),
         }),
     )
+    filter_horizontal = ('roles', 'groups', 'user_permissions')
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
 
 
+class RoleAdminForm(forms.ModelForm):
+    """
+    Форма роли в админке с проверкой циклов в иерархии.
+    """
+
+    class Meta:
+        model = Role
+        fields = '__all__'
+
+    def clean_parents(self):
+        """
+        Запрещает циклы в иерархии ролей.
+        """
+        parents = self.cleaned_data['parents']
+        if creates_cycle(self.instance, parents):
+            raise forms.ValidationError(
+                'Роль не может наследовать саму себя или своего потомка'
+            )
+        return parents
+
+
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
     """
     Админка для модели роли.
     """
+    form = RoleAdminForm
     list_display = ('name', 'description')
 
 
@@ -69,3 +98,20 @@ class SessionAdmin(admin.ModelAdmin):
     Админка для модели сессии пользователя.
     """
     list_display = ('user', 'created_at', 'expires_at')
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    """
+    Админка журнала аудита (только чтение).
+    """
+    list_display = (
+        'created_at', 'event', 'user_id', 'element', 'permission', 'allowed'
+    )
+    list_filter = ('event', 'allowed')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
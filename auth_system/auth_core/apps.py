@@ -6,4 +6,5 @@ class AuthCoreConfig(AppConfig):
     name = 'auth_core'
 
     def ready(self):
+        import auth_core.checks
         import auth_core.signals
@@ -0,0 +1,265 @@
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .audit import audit_log
+from .hashing import HashingPoolBusy
+from .models import User
+from .serializers import (
+    UserRegistrationSerializer, UserLoginSerializer, UserUpdateSerializer
+)
+from .ratelimit import (
+    THROTTLED_MESSAGE, arecord_failed_login, client_ip,
+    get_login_rate_limiter, lockout_remaining, retry_after_header
+)
+from .session_store import get_session_store
+
+
+def json_response(data, status=200):
+    """
+    Возвращает JSON-ответ без экранирования кириллицы.
+    """
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def busy_response():
+    """
+    Ответ при переполненной очереди хеширования.
+    """
+    response = json_response(
+        {'error': 'Сервис перегружен, повторите попытку позже'}, status=503
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+def throttled_response(retry_after):
+    """
+    Ответ при превышении лимита попыток входа.
+    """
+    response = json_response({'error': THROTTLED_MESSAGE}, status=429)
+    response['Retry-After'] = retry_after_header(retry_after)
+    return response
+
+
+def authenticated(view):
+    """
+    Пропускает только пользователей, аутентифицированных middleware,
+    как IsAuthenticated в DRF-представлениях.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Учетные данные не были предоставлены.'},
+                status=403
+            )
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def bearer_token(request):
+    """
+    Возвращает токен из заголовка Authorization или None.
+    """
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
+def parse_body(request):
+    """
+    Разбирает JSON-тело запроса. Возвращает None при ошибке разбора.
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def register_view(request):
+    """
+    Асинхронно регистрирует нового пользователя.
+    Пароль хешируется в пуле хеширования, а не в потоке запроса.
+    """
+    data = parse_body(request)
+    if data is None:
+        return json_response({'error': 'Некорректный JSON'}, status=400)
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return json_response(serializer.errors, status=400)
+    validated_data = dict(serializer.validated_data)
+    validated_data.pop('password_confirm')
+    password = validated_data.pop('password')
+    user = User(**validated_data)
+    try:
+        await user.aset_password(password)
+    except HashingPoolBusy:
+        return busy_response()
+    await user.asave()
+    return json_response(
+        {'message': 'Пользователь успешно зарегистрирован'}, status=201
+    )
+
+
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    """
+    Асинхронно аутентифицирует пользователя и создает сессию.
+    Пароль проверяется в пуле хеширования, а не в потоке запроса.
+    """
+    data = parse_body(request)
+    if data is None:
+        return json_response({'error': 'Некорректный JSON'}, status=400)
+    serializer = UserLoginSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=400)
+    email = serializer.validated_data['email']
+    ip = client_ip(request)
+    limiter = get_login_rate_limiter()
+    retry_after = limiter.check(email, ip)
+    if retry_after:
+        await audit_log.arecord(
+            'login', allowed=False, ip=ip, detail=f'throttled:{email}'
+        )
+        return throttled_response(retry_after)
+    password = serializer.validated_data['password']
+    try:
+        user = await User.objects.aget_for_login(email)
+        if user is None:
+            await User.acheck_dummy_password(password)
+        else:
+            retry_after = lockout_remaining(user)
+            if retry_after:
+                # Хеш считается и здесь, чтобы по времени ответа нельзя
+                # было отличить заблокированный аккаунт.
+                await User.acheck_dummy_password(password)
+                await audit_log.arecord(
+                    'login', user.pk, False, ip=ip, detail='locked'
+                )
+                return throttled_response(retry_after)
+            if await user.acheck_password(password):
+                limiter.reset(email)
+                try:
+                    token = await get_session_store().acreate_for_login(user)
+                except User.DoesNotExist:
+                    # Пользователя удалили между поиском и входом.
+                    token = None
+                if token is not None:
+                    await audit_log.arecord('login', user.pk, True, ip=ip)
+                    return json_response({'token': token})
+            else:
+                await arecord_failed_login(user)
+    except HashingPoolBusy:
+        return busy_response()
+    await audit_log.arecord(
+        'login', getattr(user, 'pk', None), False, ip=ip,
+        detail=f'invalid:{email}'
+    )
+    return json_response({'error': 'Неверные учетные данные'}, status=401)
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+async def logout_view(request):
+    """
+    Асинхронно завершает сессию пользователя.
+    """
+    token = bearer_token(request)
+    if token:
+        await get_session_store().adelete(token)
+    await audit_log.arecord('logout', request.user.pk, ip=client_ip(request))
+    return json_response({'message': 'Успешный выход'})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+async def logout_all_view(request):
+    """
+    Асинхронно завершает все сессии пользователя.
+    """
+    await get_session_store().adelete_for_user(request.user)
+    await audit_log.arecord(
+        'logout', request.user.pk, ip=client_ip(request), detail='all'
+    )
+    return json_response({'message': 'Все сессии завершены'})
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+@authenticated
+async def update_profile_view(request):
+    """
+    Асинхронно обновляет профиль пользователя.
+    """
+    data = parse_body(request)
+    if data is None:
+        return json_response({'error': 'Некорректный JSON'}, status=400)
+    serializer = UserUpdateSerializer(request.user, data=data, partial=True)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=400)
+    for field, value in serializer.validated_data.items():
+        setattr(request.user, field, value)
+    await request.user.asave()
+    return json_response(UserUpdateSerializer(request.user).data)
+
+
+@csrf_exempt
+@require_http_methods(['DELETE'])
+@authenticated
+async def delete_account_view(request):
+    """
+    Асинхронно деактивирует аккаунт пользователя и удаляет его сессии.
+    """
+    request.user.is_active = False
+    await request.user.asave()
+    await get_session_store().adelete_for_user(request.user)
+    return json_response({'message': 'Аккаунт удален'})
+
+
+@require_http_methods(['GET'])
+@authenticated
+async def mock_users_view(request):
+    """
+    Асинхронный мок-эндпоинт для списка пользователей.
+    """
+    return json_response({'data': 'Список пользователей'})
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@authenticated
+async def mock_products_view(request):
+    """
+    Асинхронный мок-эндпоинт для списка и создания товаров.
+    """
+    if request.method == 'GET':
+        return json_response({'data': 'Список товаров'})
+    return json_response({'data': 'Товар создан'})
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+@authenticated
+async def mock_orders_view(request):
+    """
+    Асинхронный мок-эндпоинт для заказов (просмотр, обновление, удаление).
+    """
+    if request.method == 'GET':
+        return json_response({'data': 'Список заказов'})
+    elif request.method == 'PUT':
+        return json_response({'data': 'Заказ обновлен'})
+    return json_response({'data': 'Заказ удален'})
@@ -0,0 +1,231 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = (
+    'created_at', 'event', 'user_id', 'element', 'permission', 'allowed',
+    'ip', 'detail',
+)
+
+
+class DatabaseAuditSink:
+    """
+    Записывает события аудита в таблицу AuditEvent пакетным INSERT.
+    """
+
+    def write(self, events):
+        from .models import AuditEvent
+
+        detail_length = AuditEvent._meta.get_field('detail').max_length
+        AuditEvent.objects.bulk_create(
+            [
+                AuditEvent(**dict(event, detail=event['detail'][:detail_length]))
+                for event in events
+            ],
+            batch_size=500
+        )
+
+
+class JSONLAuditSink:
+    """
+    Дописывает события аудита в файл AUTH_AUDIT_LOG_PATH, по одной
+    JSON-строке на событие.
+    """
+
+    def __init__(self):
+        self.path = getattr(settings, 'AUTH_AUDIT_LOG_PATH', 'audit.jsonl')
+
+    def write(self, events):
+        lines = ''.join(
+            json.dumps(event, ensure_ascii=False, default=str) + '\n'
+            for event in events
+        )
+        with open(self.path, 'a', encoding='utf-8') as target:
+            target.write(lines)
+
+
+class AuditLog:
+    """
+    Журнал аудита решений о доступе, входов и выходов.
+    События складываются в ограниченный кольцевой буфер в памяти и
+    записываются пакетами в фоновом потоке: раз в
+    AUTH_AUDIT_FLUSH_INTERVAL секунд или когда в буфере набралось
+    AUTH_AUDIT_FLUSH_SIZE событий. При переполнении буфера самые старые
+    события вытесняются и учитываются в счетчике dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = None
+        self._sink = None
+        self._worker = None
+        self._interval = None
+        self._flush_size = None
+        self.dropped = 0
+        self.failed = 0
+        self.written = 0
+        self._reported_drops = 0
+
+    @property
+    def enabled(self):
+        """Включен ли аудит (задан AUTH_AUDIT_SINK)."""
+        return bool(getattr(settings, 'AUTH_AUDIT_SINK', None))
+
+    @property
+    def interval(self):
+        """Период сброса буфера в секундах."""
+        return getattr(settings, 'AUTH_AUDIT_FLUSH_INTERVAL', 1)
+
+    def record(self, event, user_id=None, allowed=True, element='',
+               permission='', ip=None, detail=''):
+        """
+        Кладет событие в буфер. Если период сброса не задан, пишет сразу.
+        """
+        if self._add(
+            (time.time(), event, user_id, element, permission, allowed,
+             ip, detail)
+        ):
+            self.flush()
+
+    async def arecord(self, event, user_id=None, allowed=True, element='',
+                      permission='', ip=None, detail=''):
+        """
+        Асинхронный вариант record.
+        """
+        if self._add(
+            (time.time(), event, user_id, element, permission, allowed,
+             ip, detail)
+        ):
+            await sync_to_async(self.flush)()
+
+    def _add(self, entry):
+        """
+        Кладет событие в буфер. Возвращает True, если буфер нужно
+        записать сразу.
+        """
+        buffer = self._buffer
+        if buffer is None:
+            if not self.enabled:
+                return False
+            buffer = self._start()
+        with self._lock:
+            if len(buffer) == buffer.maxlen:
+                self.dropped += 1
+            buffer.append(entry)
+            pending = len(buffer)
+        if not self._interval:
+            return True
+        worker = self._worker
+        if worker is not None and pending >= self._flush_size:
+            worker.wake()
+        return False
+
+    def _start(self):
+        # Настройки читаются один раз: при их изменении в тестах журнал
+        # пересоздается сигналом setting_changed.
+        with self._lock:
+            if self._buffer is None:
+                self._sink = import_string(settings.AUTH_AUDIT_SINK)()
+                self._interval = self.interval
+                self._flush_size = getattr(
+                    settings, 'AUTH_AUDIT_FLUSH_SIZE', 500
+                )
+                self._buffer = deque(
+                    maxlen=getattr(settings, 'AUTH_AUDIT_BUFFER_SIZE', 10000)
+                )
+                if self._interval:
+                    self._worker = PeriodicWorker(
+                        'auth-audit', self._interval, self.flush
+                    )
+                    self._worker.start()
+            return self._buffer
+
+    def flush(self):
+        """
+        Записывает накопленные события.
+        Возвращает количество записанных событий. События, которые не
+        удалось записать, учитываются в счетчике failed.
+        """
+        buffer = self._buffer
+        if buffer is None:
+            return 0
+        with self._lock:
+            entries = list(buffer)
+            buffer.clear()
+            dropped = self.dropped - self._reported_drops
+            self._reported_drops = self.dropped
+        if dropped:
+            logger.warning(
+                'Буфер аудита переполнен, потеряно событий: %s', dropped
+            )
+        if not entries:
+            return 0
+        events = [
+            dict(
+                zip(EVENT_FIELDS, entry),
+                created_at=datetime.fromtimestamp(entry[0], timezone.utc)
+            )
+            for entry in entries
+        ]
+        try:
+            self._sink.write(events)
+        except Exception:
+            logger.exception('Не удалось записать события аудита')
+            with self._lock:
+                self.failed += len(events)
+            return 0
+        with self._lock:
+            self.written += len(events)
+        return len(events)
+
+    def stats(self):
+        """
+        Состояние журнала: событий в буфере, записано, вытеснено
+        при переполнении и потеряно из-за ошибок записи.
+        """
+        buffer = self._buffer
+        with self._lock:
+            return {
+                'buffered': len(buffer) if buffer is not None else 0,
+                'capacity': buffer.maxlen if buffer is not None else 0,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    def reset(self):
+        """
+        Записывает остаток буфера и останавливает фоновый поток.
+        """
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.stop()
+        else:
+            self.flush()
+        self._buffer = None
+        self._sink = None
+
+
+audit_log = AuditLog()
+
+
+@receiver(setting_changed)
+def reset_audit_log(setting, **kwargs):
+    """
+    Пересоздает буфер и хранилище аудита при изменении настроек в тестах.
+    """
+    if setting.startswith('AUTH_AUDIT'):
+        audit_log.reset()
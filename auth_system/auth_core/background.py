@@ -0,0 +1,80 @@
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    """
+    Фоновый поток-демон, периодически вызывающий функцию.
+    Вызов можно ускорить методом wake. По умолчанию при завершении
+    процесса функция вызывается последний раз.
+    """
+
+    def __init__(self, name, interval, func, call_on_stop=True):
+        """
+        :param name: Имя потока
+        :param interval: Период вызова в секундах
+        :param func: Вызываемая функция без аргументов
+        :param call_on_stop: Вызывать ли функцию при остановке
+        """
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.call_on_stop = call_on_stop
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Запускает поток, если он еще не запущен.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Останавливает поток и при необходимости выполняет последний
+        вызов функции.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop_event.set()
+        self._wake_event.set()
+        thread.join(timeout=self.interval)
+        if self.call_on_stop:
+            self._call()
+
+    def wake(self):
+        """
+        Вызывает функцию, не дожидаясь конца периода.
+        """
+        self._wake_event.set()
+
+    def _run(self):
+        while True:
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                return
+            self._call()
+
+    def _call(self):
+        try:
+            self.func()
+        except Exception:
+            logger.exception('Ошибка в фоновой задаче %s', self.name)
@@ -0,0 +1,241 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .models import AccessRule, BusinessElement, Role, User
+from .permissions import HasPermission
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+MOCK_ELEMENTS = {
+    'users': '/api/mock/users/',
+    'products': '/api/mock/products/',
+    'orders': '/api/mock/orders/',
+}
+
+
+def percentile(values, fraction):
+    """
+    Возвращает перцентиль отсортированного списка значений.
+    """
+    if not values:
+        return 0.0
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def summarize(latencies, queries, errors, elapsed):
+    """
+    Сводит замеры одного прогона в словарь метрик.
+    """
+    latencies = sorted(latencies)
+    total = len(latencies)
+    return {
+        'requests': total,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if total else 0,
+        'queries_per_request': round(sum(queries) / total, 2) if total else 0,
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0,
+    }
+
+
+def seed(users=16):
+    """
+    Создает роли, правила и пользователей для прогона.
+    Возвращает список email созданных пользователей.
+    """
+    admin_role, _ = Role.objects.get_or_create(name='admin')
+    for name in list(MOCK_ELEMENTS) + ['access_rules']:
+        element, _ = BusinessElement.objects.get_or_create(name=name)
+        AccessRule.objects.update_or_create(
+            role=admin_role, element=element,
+            defaults={
+                'read_permission': True,
+                'read_all_permission': True,
+                'create_permission': True,
+                'update_permission': True,
+                'update_all_permission': True,
+                'delete_permission': True,
+                'delete_all_permission': True,
+            }
+        )
+    emails = []
+    for index in range(users):
+        email = f'bench{index}@example.com'
+        if not User.objects.filter(email=email).exists():
+            User.objects.create_user(
+                email, BENCHMARK_PASSWORD,
+                first_name='Bench', last_name=str(index), role=admin_role
+            )
+        emails.append(email)
+    return emails
+
+
+class BenchmarkWorker:
+    """
+    Поток нагрузки со своим тестовым клиентом и токеном.
+    """
+
+    def __init__(self, index, email):
+        self.index = index
+        self.email = email
+        self.client = Client()
+        self.token = None
+        self.user = User.objects.select_related('role').get(email=email)
+
+    def login(self):
+        response = self.client.post(
+            '/api/auth/login/',
+            {'email': self.email, 'password': BENCHMARK_PASSWORD},
+            content_type='application/json'
+        )
+        if response.status_code == 200:
+            self.token = response.json()['token']
+        return response.status_code == 200
+
+    def request(self, method, path, data=None):
+        response = getattr(self.client, method)(
+            path, data, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        return response.status_code < 400, response
+
+
+class PermissionRequest:
+    """
+    Минимальный объект запроса для прямой проверки HasPermission.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+
+def run_scenario(name, emails, concurrency, iterations):
+    """
+    Выполняет сценарий в concurrency потоках по iterations запросов
+    в каждом и возвращает метрики.
+    """
+    scenario = SCENARIOS[name]
+    workers = [
+        BenchmarkWorker(index, emails[index % len(emails)])
+        for index in range(concurrency)
+    ]
+    if name != 'login':
+        for worker in workers:
+            worker.login()
+
+    def run(worker):
+        latencies, queries, errors = [], [], 0
+        try:
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    ok = scenario(worker)
+                    latencies.append(time.perf_counter() - started)
+                queries.append(len(captured.captured_queries))
+                errors += 0 if ok else 1
+        finally:
+            close_old_connections()
+        return latencies, queries, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run, workers))
+    elapsed = time.perf_counter() - started
+
+    latencies, queries, errors = [], [], 0
+    for worker_latencies, worker_queries, worker_errors in results:
+        latencies.extend(worker_latencies)
+        queries.extend(worker_queries)
+        errors += worker_errors
+    return summarize(latencies, queries, errors, elapsed)
+
+
+def scenario_login(worker):
+    return worker.login()
+
+
+def scenario_authenticated(worker):
+    return worker.request('get', '/api/mock/users/')[0]
+
+
+def scenario_permissions(worker):
+    request = PermissionRequest(worker.user)
+    return all(
+        HasPermission(element, 'read_permission').has_permission(request, None)
+        for element in MOCK_ELEMENTS
+    )
+
+
+def make_mock_scenario(path):
+    def scenario(worker):
+        return worker.request('get', path)[0]
+    return scenario
+
+
+def scenario_rules_crud(worker):
+    ok, response = worker.request('get', '/api/rules/')
+    if not ok:
+        return False
+    element, _ = BusinessElement.objects.get_or_create(
+        name=f'bench-element-{worker.index}'
+    )
+    ok, response = worker.request(
+        'post', '/api/rules/',
+        {
+            'role': worker.user.role_id,
+            'element': element.pk,
+            'read_permission': True,
+        }
+    )
+    if not ok:
+        return False
+    path = f"/api/rules/{response.json()['id']}/"
+    ok_update, _ = worker.request(
+        'patch', path, {'update_permission': True}
+    )
+    ok_retrieve, _ = worker.request('get', path)
+    ok_delete, _ = worker.request('delete', path)
+    return ok_update and ok_retrieve and ok_delete
+
+
+SCENARIOS = {
+    'login': scenario_login,
+    'authenticated': scenario_authenticated,
+    'permissions': scenario_permissions,
+    'rules_crud': scenario_rules_crud,
+}
+SCENARIOS.update({
+    f'mock_{element}': make_mock_scenario(path)
+    for element, path in MOCK_ELEMENTS.items()
+})
+
+
+def compare(results, baseline, tolerance):
+    """
+    Сравнивает прогон с базовой линией.
+    Возвращает список описаний регрессий.
+    """
+    regressions = []
+    for name, by_concurrency in results.items():
+        for concurrency, current in by_concurrency.items():
+            previous = baseline.get(name, {}).get(concurrency)
+            if previous is None:
+                continue
+            if current['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+                regressions.append(
+                    f"{name} x{concurrency}: p99 {previous['p99_ms']} -> "
+                    f"{current['p99_ms']} ms"
+                )
+            if current['queries_per_request'] > previous['queries_per_request']:
+                regressions.append(
+                    f"{name} x{concurrency}: запросов к БД "
+                    f"{previous['queries_per_request']} -> "
+                    f"{current['queries_per_request']}"
+                )
+    return regressions
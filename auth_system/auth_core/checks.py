@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Запрещает кэш в памяти процесса, если процессов несколько: иначе
+    изменения прав, отзыв токенов и метки read-your-writes не доходят
+    до остальных процессов.
+    """
+    if getattr(settings, 'AUTH_WORKERS', 1) <= 1:
+        return []
+    aliases = {
+        'default',
+        getattr(settings, 'AUTH_SESSION_CACHE_ALIAS', 'default'),
+        getattr(settings, 'AUTH_LOGIN_RATE_LIMIT_CACHE_ALIAS', 'default'),
+    }
+    errors = []
+    for alias in sorted(aliases):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHES:
+            errors.append(Error(
+                f'Кэш "{alias}" ({backend}) виден только одному процессу, '
+                f'а AUTH_WORKERS = {settings.AUTH_WORKERS}.',
+                hint='Задайте CACHE_BACKEND=redis или CACHE_BACKEND=file.',
+                id='auth_core.E001',
+            ))
+    return errors
@@ -0,0 +1,136 @@
+import contextvars
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_ALIAS = 'replica'
+USER_MODELS = ('session', 'user')
+RBAC_MODELS = (
+    'role', 'businesselement', 'accessrule', 'roleclosure',
+    'effectivepermission',
+)
+REPLICA_MODELS = USER_MODELS + (
+    'businesselement', 'accessrule', 'effectivepermission',
+)
+USER_PIN_CACHE_PREFIX = 'auth_core:db_pin:user:'
+RBAC_PIN_CACHE_KEY = 'auth_core:db_pin:rbac'
+
+_state = contextvars.ContextVar('auth_core_db_state', default=None)
+
+
+class StickyState:
+    """
+    Состояние маршрутизации текущего запроса: читать ли с основной базы
+    и каких пользователей затронули записи.
+    """
+
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.written = False
+        self.written_users = set()
+
+
+def replica_enabled():
+    """
+    Проверяет, настроена ли реплика для чтения.
+    """
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def sticky_seconds():
+    """
+    Окно read-your-writes после записи (AUTH_DB_STICKY_SECONDS).
+    """
+    return getattr(settings, 'AUTH_DB_STICKY_SECONDS', 5)
+
+
+def begin_request(user_id=None):
+    """
+    Начинает запрос. Если пользователь недавно писал в базу, его чтения
+    идут на основную базу. Возвращает токен контекста.
+    """
+    primary = user_id is not None and bool(
+        cache.get(USER_PIN_CACHE_PREFIX + str(user_id))
+    )
+    return _state.set(StickyState(primary))
+
+
+def finish_request(token, user_id=None):
+    """
+    Завершает запрос: закрепляет за основной базой пользователей,
+    чьи данные были изменены.
+    """
+    state = _state.get()
+    _state.reset(token)
+    if state is None:
+        return
+    user_ids = set(state.written_users)
+    if state.written and user_id is not None:
+        user_ids.add(user_id)
+    if user_ids:
+        cache.set_many(
+            {USER_PIN_CACHE_PREFIX + str(pk): True for pk in user_ids},
+            timeout=sticky_seconds()
+        )
+
+
+def record_write(model, user_id=None):
+    """
+    Отмечает запись в текущем запросе. Вызывается только там, где запись
+    действительно выполнена (сигналы сохранения и удаления, точечные
+    UPDATE), а не при выборе базы для записи.
+    :param model: Модель, в которую записали
+    :param user_id: Пользователь, чьи сессия или профиль изменились
+    """
+    if model._meta.app_label != 'auth_core' or not replica_enabled():
+        return
+    name = model._meta.model_name
+    if name in RBAC_MODELS:
+        cache.set(RBAC_PIN_CACHE_KEY, True, timeout=sticky_seconds())
+        return
+    state = _state.get()
+    if state is None or name not in USER_MODELS:
+        return
+    state.written = True
+    if user_id is not None:
+        state.written_users.add(user_id)
+
+
+class AuthReplicaRouter:
+    """
+    Роутер базы данных для пути чтения аутентификации и авторизации.
+    Чтения Session, User, BusinessElement, AccessRule и EffectivePermission
+    уходят на реплику
+    (алиас replica), если она настроена; все записи и остальные модели
+    работают с основной базой.
+    После записи чтения на AUTH_DB_STICKY_SECONDS секунд возвращаются на
+    основную базу (read-your-writes): для Session и User — только для
+    затронутого пользователя, для правил доступа — для всех процессов.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label != 'auth_core'
+            or model._meta.model_name not in REPLICA_MODELS
+            or not replica_enabled()
+        ):
+            return 'default'
+        if model._meta.model_name in USER_MODELS:
+            state = _state.get()
+            if state is not None and (state.primary or state.written):
+                return 'default'
+        elif cache.get(RBAC_PIN_CACHE_KEY):
+            return 'default'
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Выбор базы для записи еще не запись: метки read-your-writes
+        # ставит record_write.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит копию основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
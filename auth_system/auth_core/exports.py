@@ -0,0 +1,133 @@
+import csv
+import json
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import AccessRule, Session, User
+from .permission_matrix import PERMISSION_TYPES
+
+EXPORTS = {
+    'users': {
+        'model': User,
+        'element': 'users',
+        'fields': (
+            'id', 'email', 'first_name', 'last_name', 'patronymic',
+            'role_id', 'extra_role_ids', 'is_active', 'is_staff', 'is_superuser',
+            'last_login', 'created_at', 'updated_at',
+        ),
+    },
+    'sessions': {
+        'model': Session,
+        'element': 'users',
+        # Выгружается только хеш токена, сам токен в дамп не попадает.
+        'fields': (
+            'id', 'user_id', 'jti', 'token_hash', 'generation', 'created_at',
+            'expires_at',
+        ),
+    },
+    'rules': {
+        'model': AccessRule,
+        'element': 'access_rules',
+        'fields': ('id', 'role_id', 'element_id') + PERMISSION_TYPES,
+    },
+}
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def get_chunk_size():
+    """
+    Размер пакета строк, читаемого из базы за один раз.
+    """
+    return getattr(settings, 'AUTH_EXPORT_CHUNK_SIZE', 2000)
+
+
+def iter_rows(name, chunk_size=None):
+    """
+    Построчно читает таблицу выгрузки курсором базы данных.
+    Возвращает кортежи значений в порядке полей выгрузки.
+    """
+    export = EXPORTS[name]
+    queryset = export['model'].objects.order_by('pk').values_list(
+        *export['fields']
+    )
+    return queryset.iterator(chunk_size=chunk_size or get_chunk_size())
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """
+    Псевдо-файл для csv.writer, возвращающий записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_ndjson(fields, rows):
+    """
+    Преобразует строки в NDJSON: один JSON-объект на строку.
+    """
+    for row in rows:
+        yield json.dumps(
+            dict(zip(fields, map(_plain, row))), ensure_ascii=False
+        ) + '\n'
+
+
+def render_csv(fields, rows):
+    """
+    Преобразует строки в CSV с заголовком.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+RENDERERS = {
+    'ndjson': render_ndjson,
+    'csv': render_csv,
+}
+
+
+def export_lines(name, file_format, chunk_size=None):
+    """
+    Возвращает генератор строк выгрузки в заданном формате.
+    """
+    fields = EXPORTS[name]['fields']
+    return RENDERERS[file_format](fields, iter_rows(name, chunk_size))
+
+
+def _next_batch(lines, size):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+async def aexport_lines(name, file_format, chunk_size=None):
+    """
+    Асинхронный итератор строк выгрузки для ASGI.
+    Строки читаются синхронным генератором в потоке, пакетами по размеру
+    чанка, чтобы ASGI-обработчик не буферизовал весь ответ в памяти.
+    """
+    size = chunk_size or get_chunk_size()
+    lines = export_lines(name, file_format, size)
+    next_batch = sync_to_async(_next_batch, thread_sensitive=True)
+    while True:
+        batch = await next_batch(lines, size)
+        if not batch:
+            break
+        for line in batch:
+            yield line
@@ -0,0 +1,38 @@
+from rest_framework.filters import BaseFilterBackend
+
+from .permissions import ownership_scope
+
+METHOD_ACTIONS = {
+    'GET': 'read',
+    'HEAD': 'read',
+    'OPTIONS': 'read',
+    'PUT': 'update',
+    'PATCH': 'update',
+    'DELETE': 'delete',
+}
+
+
+class OwnershipFilterBackend(BaseFilterBackend):
+    """
+    Фильтр ABAC на уровне queryset по тем же флагам AccessRule, что и
+    HasPermission.
+    Подключается представлением через filter_backends вместе с
+    permission_element (и при необходимости owner_field, по умолчанию
+    'owner'); глобально не включен. Если у роли есть
+    право <action>_all, queryset не меняется; если только <action>,
+    добавляется условие owner_id = <пользователь>; без права queryset
+    пуст. Так список и get_object авторизуются одним SQL-запросом.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        element_name = getattr(view, 'permission_element', None)
+        action = METHOD_ACTIONS.get(request.method)
+        if element_name is None or action is None:
+            return queryset
+        scope = ownership_scope(request.user, element_name, action)
+        if scope == 'all':
+            return queryset
+        if scope == 'own':
+            owner_field = getattr(view, 'owner_field', 'owner')
+            return queryset.filter(**{owner_field: request.user.pk})
+        return queryset.none()
@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import logging
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import bcrypt
+from django.conf import settings
+
+from .instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+
+def get_rounds():
+    """
+    Возвращает настроенную стоимость bcrypt (AUTH_BCRYPT_ROUNDS).
+    """
+    return getattr(settings, 'AUTH_BCRYPT_ROUNDS', 12)
+
+
+def hash_password(raw_password, rounds=None):
+    """
+    Хеширует пароль с помощью bcrypt.
+    :param rounds: Стоимость хеширования, по умолчанию AUTH_BCRYPT_ROUNDS
+    """
+    with timed('hashing'):
+        return bcrypt.hashpw(
+            raw_password.encode('utf-8'),
+            bcrypt.gensalt(rounds or get_rounds())
+        ).decode('utf-8')
+
+
+def verify_password(raw_password, hashed_password):
+    """
+    Проверяет пароль по bcrypt-хешу.
+    """
+    try:
+        with timed('hashing'):
+            return bcrypt.checkpw(
+                raw_password.encode('utf-8'), hashed_password.encode('utf-8')
+            )
+    except (ValueError, AttributeError):
+        return False
+
+
+@lru_cache(maxsize=None)
+def _dummy_hash(rounds):
+    return hash_password(secrets.token_hex(16), rounds)
+
+
+def dummy_hash():
+    """
+    Возвращает bcrypt-хеш случайного пароля с текущей стоимостью.
+    Проверка пароля по нему занимает столько же, сколько по настоящему
+    хешу, поэтому вход с неизвестным email не отличается по времени.
+    """
+    return _dummy_hash(get_rounds())
+
+
+def password_rounds(hashed_password):
+    """
+    Извлекает стоимость из bcrypt-хеша вида $2b$12$...
+    Возвращает None, если хеш имеет другой формат.
+    """
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed_password):
+    """
+    Проверяет, отличается ли стоимость хеша от настроенной.
+    """
+    return password_rounds(hashed_password) != get_rounds()
+
+
+class HashingPoolBusy(Exception):
+    """
+    Очередь пула хеширования переполнена.
+    """
+
+
+class HashingPool:
+    """
+    Ограниченный пул потоков для bcrypt.
+    bcrypt отпускает GIL, поэтому потоков достаточно, чтобы хеширование
+    не блокировало цикл событий. Если в очереди больше
+    AUTH_HASHING_QUEUE_SIZE задач, новые сразу отклоняются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._peak_pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def workers(self):
+        """Количество потоков пула."""
+        return getattr(settings, 'AUTH_HASHING_WORKERS', 4)
+
+    @property
+    def queue_size(self):
+        """Максимальное количество задач в пуле, включая выполняемые."""
+        return getattr(settings, 'AUTH_HASHING_QUEUE_SIZE', 64)
+
+    async def run(self, func, *args):
+        """
+        Выполняет функцию в пуле и возвращает ее результат.
+        Бросает HashingPoolBusy, если очередь заполнена.
+        """
+        executor = self._acquire()
+        try:
+            context = contextvars.copy_context()
+            return await asyncio.wrap_future(
+                executor.submit(context.run, func, *args)
+            )
+        finally:
+            self._release()
+
+    def submit(self, func, *args):
+        """
+        Ставит функцию в пул, не дожидаясь результата.
+        Бросает HashingPoolBusy, если очередь заполнена.
+        """
+        executor = self._acquire()
+        future = executor.submit(func, *args)
+        future.add_done_callback(lambda future: self._release())
+        return future
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._rejected += 1
+                logger.warning(
+                    'Очередь хеширования заполнена: %s задач', self._pending
+                )
+                raise HashingPoolBusy()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='auth-hashing'
+                )
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+            return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def stats(self):
+        """
+        Возвращает метрики пула.
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self._pending,
+                'peak_queue_depth': self._peak_pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+
+hashing_pool = HashingPool()
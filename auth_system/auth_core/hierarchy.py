@@ -0,0 +1,153 @@
+from collections import deque
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import AccessRule, EffectivePermission, Role, RoleClosure
+from .permission_matrix import PERMISSION_TYPES, rule_mask
+
+
+# Пересчет выполняется на пути записи и читает основную базу, а не
+# реплику, которая может отставать.
+PRIMARY = DEFAULT_DB_ALIAS
+
+
+def descendants(role_ids):
+    """
+    Возвращает идентификаторы ролей и всех их потомков по таблице
+    замыкания.
+    """
+    role_ids = set(role_ids)
+    return role_ids | set(
+        RoleClosure.objects.using(PRIMARY).filter(
+            ancestor_id__in=role_ids
+        ).values_list('descendant_id', flat=True)
+    )
+
+
+def ancestors_by_depth(role_ids):
+    """
+    Обходит иерархию в ширину и возвращает для каждой роли словарь
+    {предок: глубина}, включая саму роль на глубине 0.
+    """
+    parents = {}
+    edges = Role.parents.through.objects.using(PRIMARY).values_list(
+        'from_role_id', 'to_role_id'
+    )
+    for child_id, parent_id in edges:
+        parents.setdefault(child_id, []).append(parent_id)
+    result = {}
+    for role_id in role_ids:
+        depths = {role_id: 0}
+        queue = deque([role_id])
+        while queue:
+            current = queue.popleft()
+            for parent_id in parents.get(current, ()):
+                if parent_id not in depths:
+                    depths[parent_id] = depths[current] + 1
+                    queue.append(parent_id)
+        result[role_id] = depths
+    return result
+
+
+def creates_cycle(role, parents):
+    """
+    Проверяет, появится ли цикл, если назначить роли этих родителей.
+    """
+    if role.pk is None:
+        return False
+    parent_ids = {parent.pk for parent in parents}
+    return bool(parent_ids & descendants([role.pk]))
+
+
+def recompute_roles(role_ids, hierarchy_changed=True):
+    """
+    Пересчитывает таблицу замыкания и эффективные права ролей и всех их
+    потомков.
+    :param role_ids: Измененные роли
+    :param hierarchy_changed: Менялись ли родители; если нет, замыкание
+    не пересчитывается, а читается из таблицы
+    Возвращает эффективные маски {role_id: {element_id: mask}}.
+    """
+    with transaction.atomic(using=PRIMARY):
+        # Блокировка ролей упорядочивает параллельные пересчеты одних и
+        # тех же ролей: каждый читает правила после фиксации предыдущего.
+        affected = set(Role.objects.using(PRIMARY).select_for_update().filter(
+            pk__in=descendants(role_ids)
+        ).order_by('pk').values_list('pk', flat=True))
+        if not affected:
+            return {}
+        return _recompute(affected, hierarchy_changed)
+
+
+def _recompute(affected, hierarchy_changed):
+    if hierarchy_changed:
+        ancestors = ancestors_by_depth(affected)
+        for role_id, depths in ancestors.items():
+            RoleClosure.objects.using(PRIMARY).filter(
+                descendant_id=role_id
+            ).exclude(ancestor_id__in=depths).delete()
+        RoleClosure.objects.using(PRIMARY).bulk_create(
+            [
+                RoleClosure(ancestor_id=ancestor_id, descendant_id=role_id,
+                            depth=depth)
+                for role_id, depths in ancestors.items()
+                for ancestor_id, depth in depths.items()
+            ],
+            update_conflicts=True,
+            unique_fields=('descendant', 'ancestor'),
+            update_fields=('depth',)
+        )
+    else:
+        ancestors = {role_id: {role_id: 0} for role_id in affected}
+        links = RoleClosure.objects.using(PRIMARY).filter(
+            descendant_id__in=affected
+        ).values_list('descendant_id', 'ancestor_id', 'depth')
+        for role_id, ancestor_id, depth in links:
+            ancestors[role_id][ancestor_id] = depth
+
+    rule_masks = {}
+    rules = AccessRule.objects.using(PRIMARY).filter(
+        role_id__in=set().union(*ancestors.values())
+    ).values_list('role_id', 'element_id', *PERMISSION_TYPES)
+    for role_id, element_id, *values in rules:
+        rule_masks.setdefault(role_id, {})[element_id] = rule_mask(values)
+
+    effective = {}
+    for role_id, depths in ancestors.items():
+        masks = effective.setdefault(role_id, {})
+        for ancestor_id in depths:
+            for element_id, mask in rule_masks.get(ancestor_id, {}).items():
+                masks[element_id] = masks.get(element_id, 0) | mask
+
+    # Строки обновляются на месте, а не удаляются и вставляются заново,
+    # чтобы не нарушать уникальность (role, element).
+    for role_id, masks in effective.items():
+        EffectivePermission.objects.using(PRIMARY).filter(
+            role_id=role_id
+        ).exclude(
+            element_id__in=[element_id for element_id, mask in masks.items()
+                            if mask]
+        ).delete()
+    EffectivePermission.objects.using(PRIMARY).bulk_create(
+        [
+            EffectivePermission(
+                role_id=role_id, element_id=element_id, mask=mask
+            )
+            for role_id, masks in effective.items()
+            for element_id, mask in masks.items()
+            if mask
+        ],
+        update_conflicts=True,
+        unique_fields=('role', 'element'),
+        update_fields=('mask',)
+    )
+    return effective
+
+
+def rebuild_all():
+    """
+    Полностью пересчитывает замыкание и эффективные права всех ролей.
+    """
+    return recompute_roles(
+        Role.objects.using(PRIMARY).values_list('pk', flat=True)
+    )
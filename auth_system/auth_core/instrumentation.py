@@ -0,0 +1,192 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+TIMING_NAMES = ('db', 'auth', 'permission', 'hashing', 'total')
+
+_current = contextvars.ContextVar('auth_core_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Замеры одного запроса: время по участкам и число SQL-запросов.
+    """
+
+    def __init__(self):
+        self.durations = dict.fromkeys(TIMING_NAMES, 0.0)
+        self.queries = 0
+
+    def add(self, name, seconds):
+        """
+        Добавляет время к участку.
+        """
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        """
+        Возвращает значение заголовка Server-Timing.
+        """
+        parts = []
+        for name, seconds in self.durations.items():
+            entry = f'{name};dur={seconds * 1000:.2f}'
+            if name == 'db':
+                entry += f';desc="{self.queries} queries"'
+            parts.append(entry)
+        return ', '.join(parts)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин в миллисекундах.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.buckets[bisect_left(BUCKETS_MS, value)] += 1
+
+    def as_dict(self):
+        labels = [f'<={bound}' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0,
+            'buckets': dict(zip(labels, self.buckets)),
+        }
+
+
+class MetricsRegistry:
+    """
+    Агрегированные гистограммы по всем замеренным запросам процесса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._queries = Histogram()
+        self._worker = None
+
+    def record(self, metrics):
+        """
+        Добавляет замеры запроса в гистограммы.
+        """
+        with self._lock:
+            for name, seconds in metrics.durations.items():
+                self._histograms.setdefault(name, Histogram()).observe(
+                    seconds * 1000
+                )
+            self._queries.observe(metrics.queries)
+        self._schedule_log()
+
+    def snapshot(self):
+        """
+        Возвращает текущие гистограммы.
+        """
+        with self._lock:
+            data = {
+                f'{name}_ms': histogram.as_dict()
+                for name, histogram in self._histograms.items()
+            }
+            data['queries'] = self._queries.as_dict()
+            return data
+
+    def reset(self):
+        """Очищает гистограммы."""
+        with self._lock:
+            self._histograms = {}
+            self._queries = Histogram()
+
+    def log(self):
+        """
+        Пишет сводку гистограмм в лог.
+        """
+        snapshot = self.snapshot()
+        if snapshot['queries']['count']:
+            logger.info(
+                'auth metrics: %s',
+                ' '.join(
+                    f"{name}={value['mean']}"
+                    for name, value in snapshot.items()
+                ) + f" samples={snapshot['queries']['count']}"
+            )
+
+    def _schedule_log(self):
+        interval = getattr(settings, 'AUTH_INSTRUMENTATION_LOG_INTERVAL', 60)
+        if not interval or self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = PeriodicWorker(
+                    'auth-metrics-log', interval, self.log, call_on_stop=False
+                )
+        self._worker.start()
+
+
+registry = MetricsRegistry()
+
+
+def current_metrics():
+    """
+    Возвращает замеры текущего запроса или None, если запрос
+    не попал в выборку.
+    """
+    return _current.get()
+
+
+def start_request():
+    """
+    Начинает замер запроса. Возвращает замеры и токен контекста.
+    """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    """
+    Завершает замер запроса.
+    """
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """
+    Замеряет время участка кода, если текущий запрос попал в выборку.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+def query_timer(metrics):
+    """
+    Возвращает execute_wrapper, считающий SQL-запросы и их время.
+    """
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.queries += 1
+            metrics.add('db', time.perf_counter() - started)
+    return wrapper
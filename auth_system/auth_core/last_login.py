@@ -0,0 +1,92 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .background import PeriodicWorker
+
+
+class LastLoginBuffer:
+    """
+    Буфер отметок last_login.
+    Накапливает время последнего запроса пользователей в памяти и
+    периодически записывает их одним пакетным UPDATE.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._worker = None
+
+    @property
+    def interval(self):
+        """Период сброса буфера в секундах."""
+        return getattr(settings, 'AUTH_LAST_LOGIN_FLUSH_INTERVAL', 30)
+
+    def record(self, user_id, timestamp=None):
+        """
+        Запоминает время последнего запроса пользователя.
+        Если период сброса не задан, пишет в базу сразу.
+        """
+        if self._add(user_id, timestamp):
+            self.flush()
+
+    async def arecord(self, user_id, timestamp=None):
+        """
+        Асинхронный вариант record.
+        """
+        if self._add(user_id, timestamp):
+            await sync_to_async(self.flush)()
+
+    def discard(self, user_id):
+        """
+        Убирает отложенную отметку пользователя из буфера.
+        """
+        with self._lock:
+            self._pending.pop(user_id, None)
+
+    def _add(self, user_id, timestamp):
+        """
+        Кладет отметку в буфер. Возвращает True, если ее нужно записать
+        сразу.
+        """
+        with self._lock:
+            self._pending[user_id] = timestamp or timezone.now()
+        if not self.interval:
+            return True
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = PeriodicWorker(
+                        'auth-last-login', self.interval, self.flush
+                    )
+            self._worker.start()
+        return False
+
+    def flush(self):
+        """
+        Записывает накопленные отметки в базу.
+        Возвращает количество обновленных пользователей.
+        """
+        from .models import User
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        users = [
+            User(pk=user_id, last_login=timestamp)
+            for user_id, timestamp in pending.items()
+        ]
+        try:
+            User.objects.bulk_update(users, ['last_login'], batch_size=500)
+        except Exception:
+            with self._lock:
+                for user_id, timestamp in pending.items():
+                    self._pending.setdefault(user_id, timestamp)
+            raise
+        return len(users)
+
+
+last_login_buffer = LastLoginBuffer()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_core.models import Session
+
+
+class Command(BaseCommand):
+    """
+    Переносит сессии, созданные до появления token_hash, на поиск по хешу.
+    Для каждой такой сессии вычисляет SHA-256 токена и очищает полный
+    токен.
+    """
+    help = 'Заполняет Session.token_hash для сессий со старым форматом'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество сессий в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Session.objects.filter(
+            token_hash__isnull=True, token__isnull=False
+        ).order_by('pk')
+        total = 0
+        while True:
+            with transaction.atomic():
+                sessions = list(pending.only('pk', 'token')[:batch_size])
+                if not sessions:
+                    break
+                for session in sessions:
+                    session.token_hash = Session.hash_token(session.token)
+                    session.token = None
+                Session.objects.bulk_update(
+                    sessions, ['token_hash', 'token']
+                )
+            total += len(sessions)
+            self.stdout.write(f'Обработано сессий: {total}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, перенесено сессий: {total}'
+        ))
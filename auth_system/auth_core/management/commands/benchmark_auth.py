@@ -0,0 +1,132 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment
+)
+from django.utils import timezone
+
+from auth_core.audit import audit_log
+from auth_core.benchmarks import SCENARIOS, compare, run_scenario, seed
+from auth_core.hashing import get_rounds
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочные и микро-бенчмарки горячих путей аутентификации и RBAC.
+    Прогон выполняется на отдельной тестовой базе текущего бэкенда
+    (SQLite или PostgreSQL), результаты сохраняются в JSON.
+    """
+    help = 'Бенчмарки входа, проверки токена, HasPermission и rules/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS),
+            help='Сценарии через запятую'
+        )
+        parser.add_argument(
+            '--concurrency', default='1,4,16',
+            help='Уровни параллелизма через запятую'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Количество запросов на поток'
+        )
+        parser.add_argument(
+            '--users', type=int, default=16,
+            help='Количество тестовых пользователей'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON'
+        )
+        parser.add_argument(
+            '--baseline', help='JSON базовой линии для сравнения'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p99 относительно базовой линии'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(unknown)}')
+        levels = [int(level) for level in options['concurrency'].split(',')]
+
+        if connection.vendor == 'sqlite':
+            # Потоки нагрузки должны видеть одну базу, поэтому вместо
+            # базы в памяти используется временный файл.
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            if not test_settings.get('NAME'):
+                test_settings['NAME'] = str(
+                    Path(settings.BASE_DIR) / 'benchmark.sqlite3'
+                )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Сценарии многократно входят под одними и теми же пользователями,
+        # поэтому ограничение попыток входа на время прогона отключается.
+        no_rate_limits = override_settings(AUTH_LOGIN_RATE_LIMITS={})
+        no_rate_limits.enable()
+        try:
+            emails = seed(options['users'])
+            results = {}
+            for name in scenarios:
+                results[name] = {}
+                for level in levels:
+                    stats = run_scenario(
+                        name, emails, level, options['iterations']
+                    )
+                    results[name][str(level)] = stats
+                    self.stdout.write(
+                        f"{name:<16} x{level:<3} "
+                        f"p50={stats['p50_ms']:>8} ms  "
+                        f"p99={stats['p99_ms']:>8} ms  "
+                        f"q/req={stats['queries_per_request']:>5}  "
+                        f"rps={stats['throughput_rps']:>8}  "
+                        f"errors={stats['errors']}"
+                    )
+            vendor = connection.vendor
+        finally:
+            no_rate_limits.disable()
+            # Остаток журнала аудита записывается в тестовую базу до ее
+            # удаления.
+            audit_log.reset()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'bcrypt_rounds': get_rounds(),
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(
+                json.dumps(report, indent=2, ensure_ascii=False)
+            )
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = compare(
+                results, baseline['results'], options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно базовой линии:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий не найдено'))
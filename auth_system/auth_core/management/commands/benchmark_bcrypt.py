@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auth_core.hashing import get_rounds, hash_password
+
+
+class Command(BaseCommand):
+    """
+    Подбирает стоимость bcrypt под целевое время хеширования
+    на текущем оборудовании.
+    """
+    help = 'Подбирает AUTH_BCRYPT_ROUNDS под целевое время хеширования'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms', type=float, default=250,
+            help='Целевое время одного хеширования в миллисекундах'
+        )
+        parser.add_argument(
+            '--min-rounds', type=int, default=4,
+            help='Минимальная проверяемая стоимость'
+        )
+        parser.add_argument(
+            '--max-rounds', type=int, default=16,
+            help='Максимальная проверяемая стоимость'
+        )
+        parser.add_argument(
+            '--samples', type=int, default=3,
+            help='Количество замеров для каждой стоимости'
+        )
+
+    def handle(self, *args, **options):
+        min_rounds = options['min_rounds']
+        max_rounds = options['max_rounds']
+        if not 4 <= min_rounds <= max_rounds <= 31:
+            raise CommandError('Стоимость bcrypt должна быть в диапазоне 4..31')
+
+        target_ms = options['target_ms']
+        recommended = min_rounds
+        self.stdout.write(f'Текущая стоимость: {get_rounds()}')
+        for rounds in range(min_rounds, max_rounds + 1):
+            elapsed_ms = self.measure(rounds, options['samples'])
+            self.stdout.write(f'rounds={rounds:>2}  {elapsed_ms:8.1f} ms')
+            if elapsed_ms > target_ms:
+                break
+            recommended = rounds
+
+        self.stdout.write(self.style.SUCCESS(
+            f'AUTH_BCRYPT_ROUNDS = {recommended}'
+        ))
+
+    @staticmethod
+    def measure(rounds, samples):
+        """
+        Возвращает медианное время хеширования в миллисекундах.
+        """
+        timings = []
+        for _ in range(max(samples, 1)):
+            started = time.perf_counter()
+            hash_password('benchmark-password', rounds=rounds)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from auth_core.exports import EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """
+    Потоковая выгрузка пользователей, сессий или правил доступа
+    в NDJSON или CSV. Строки читаются из базы пакетами и сразу
+    записываются, поэтому память не растет с размером таблицы.
+    """
+    help = 'Выгружает users, sessions или rules в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', choices=sorted(FORMATS), default='ndjson',
+            help='Формат выгрузки'
+        )
+        parser.add_argument(
+            '--output', help='Файл для записи (по умолчанию stdout)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Количество строк, читаемых из базы за раз'
+        )
+
+    def handle(self, *args, **options):
+        lines = export_lines(
+            options['name'], options['format'], options['chunk_size']
+        )
+        if not options['output']:
+            sys.stdout.writelines(lines)
+            return
+        with open(
+            options['output'], 'w', encoding='utf-8', newline=''
+        ) as target:
+            target.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(
+            f"Выгрузка сохранена в {options['output']}"
+        ))
@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auth_core.hashing import get_rounds, hash_password
+from auth_core.models import User
+from auth_core.serializers import UserImportSerializer
+
+
+def read_rows(path, file_format):
+    """
+    Построчно читает CSV или JSONL и возвращает словари строк.
+    Вместо строки JSONL, которую не удалось разобрать, возвращает
+    ValueError с номером строки файла.
+    """
+    with open(path, encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield ValueError(
+                    f'некорректный JSON в строке файла {number}: {error.msg}'
+                )
+
+
+class Command(BaseCommand):
+    """
+    Потоковый импорт пользователей из CSV или JSONL.
+    Строки проверяются сериализатором, пароли хешируются в пуле
+    процессов, пользователи вставляются пакетами bulk_create. После
+    каждого пакета сохраняется контрольная точка, с которой импорт можно
+    продолжить.
+    """
+    help = 'Импортирует пользователей из CSV или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV или JSONL')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'),
+            help='Формат файла (по умолчанию по расширению)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Количество строк в одном пакете'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Количество процессов для хеширования паролей'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <path>.checkpoint)'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать импорт заново, игнорируя контрольную точку'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        file_format = options['format'] or (
+            'csv' if path.suffix.lower() == '.csv' else 'jsonl'
+        )
+        checkpoint = Path(
+            options['checkpoint'] or f'{path}.checkpoint'
+        )
+        start = 0
+        if checkpoint.exists() and not options['restart']:
+            start = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f'Продолжение со строки {start + 1}')
+
+        self.rounds = get_rounds()
+        self.workers = max(options['workers'] or 1, 1)
+        totals = {'imported': 0, 'existing': 0, 'invalid': 0}
+        position = start
+        started = time.monotonic()
+        rows = islice(read_rows(path, file_format), start, None)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                chunk_started = time.monotonic()
+                stats = self.import_chunk(chunk, position, pool)
+                position += len(chunk)
+                self.save_checkpoint(checkpoint, position)
+                for key, value in stats.items():
+                    totals[key] += value
+                elapsed = time.monotonic() - chunk_started
+                self.stdout.write(
+                    f'Строк {position}: импортировано {stats["imported"]}, '
+                    f'уже есть {stats["existing"]}, '
+                    f'ошибок {stats["invalid"]}, '
+                    f'{len(chunk) / elapsed:.0f} строк/с'
+                )
+
+        elapsed = time.monotonic() - started
+        processed = position - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: импортировано {totals["imported"]}, '
+            f'уже есть {totals["existing"]}, ошибок {totals["invalid"]}; '
+            f'{processed} строк за {elapsed:.1f} с '
+            f'({processed / elapsed if elapsed else 0:.0f} строк/с)'
+        ))
+
+    def import_chunk(self, chunk, offset, pool):
+        """
+        Проверяет, хеширует и вставляет один пакет строк.
+        """
+        stats = {'imported': 0, 'existing': 0, 'invalid': 0}
+        valid = {}
+        for index, row in enumerate(chunk, start=offset + 1):
+            if isinstance(row, ValueError):
+                stats['invalid'] += 1
+                self.stderr.write(f'Строка {index}: {row}')
+                continue
+            serializer = UserImportSerializer(data=row)
+            if not serializer.is_valid():
+                stats['invalid'] += 1
+                self.stderr.write(f'Строка {index}: ' + json.dumps(
+                    serializer.errors, ensure_ascii=False
+                ))
+                continue
+            data = dict(serializer.validated_data)
+            data['email'] = User.objects.normalize_email(data['email'])
+            if data['email'] in valid:
+                stats['existing'] += 1
+                continue
+            valid[data['email']] = data
+
+        existing = set(
+            User.objects.filter(email__in=valid).values_list('email', flat=True)
+        )
+        stats['existing'] += len(existing)
+        pending = [
+            data for email, data in valid.items() if email not in existing
+        ]
+
+        to_hash = [data for data in pending if not data.get('password_hash')]
+        hashes = pool.map(
+            hash_password,
+            [data['password'] for data in to_hash],
+            repeat(self.rounds),
+            chunksize=max(len(to_hash) // (self.workers * 4), 1)
+        )
+        for data, hashed in zip(to_hash, hashes):
+            data['password_hash'] = hashed
+
+        users = []
+        for data in pending:
+            password = data.pop('password_hash')
+            data.pop('password', None)
+            users.append(User(password=password, **data))
+        # ignore_conflicts молча пропускает email, добавленные после проверки
+        # выше (например, параллельным импортом), а bulk_create не сообщает,
+        # какие строки вставлены. Поэтому вставленные считаются по числу
+        # email пакета в базе до и после вставки.
+        emails = [user.email for user in users]
+        with transaction.atomic():
+            before = User.objects.filter(email__in=emails).count()
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            after = User.objects.filter(email__in=emails).count()
+        stats['imported'] = after - before
+        stats['existing'] += len(users) - stats['imported']
+        return stats
+
+    @staticmethod
+    def save_checkpoint(checkpoint, position):
+        """
+        Атомарно сохраняет номер последней обработанной строки.
+        """
+        temporary = checkpoint.with_name(checkpoint.name + '.tmp')
+        temporary.write_text(str(position))
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth_core.reaper import reap_expired_sessions
+
+
+class Command(BaseCommand):
+    """
+    Удаляет истекшие сессии пользователей пакетами.
+    """
+    help = 'Удаляет истекшие сессии пакетами ограниченного размера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Максимальное количество строк в одном DELETE'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Пауза между пакетами в секундах'
+        )
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Ограничение на количество пакетов за запуск'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        reclaimed = reap_expired_sessions(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            max_batches=options['max_batches']
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено истекших сессий: {reclaimed} за {elapsed:.2f} с'
+        ))
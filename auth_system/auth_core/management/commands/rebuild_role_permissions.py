@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_core.hierarchy import rebuild_all
+from auth_core.permission_matrix import permission_matrix
+
+
+class Command(BaseCommand):
+    """
+    Полный пересчет таблицы замыкания ролей и эффективных прав.
+    Обычно права пересчитываются автоматически при изменении ролей и
+    правил; команда нужна после прямых правок в базе.
+    """
+    help = 'Пересчитывает иерархию ролей и эффективные права'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            effective = rebuild_all()
+            transaction.on_commit(permission_matrix.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано ролей: {len(effective)}'
+        ))
@@ -1,14 +1,36 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
-from .models import Session
-from django.utils import timezone
+from . import db_routers
+from .instrumentation import (
+    finish_request, query_timer, registry, start_request, timed
+)
+from .last_login import last_login_buffer
+from .reaper import start_reaper
+from .session_store import get_session_store
+from .stateless import aauthenticate_token, authenticate_token, decode_token
 
 
 class CustomAuthenticationMiddleware(MiddlewareMixin):
     """
     Middleware для аутентификации пользователя по JWT-токену из заголовка.
     Если токен валиден, устанавливает request.user как пользователя из сессии.
+    Сессии проверяются через хранилище AUTH_SESSION_STORE.
+    При AUTH_STATELESS_TOKENS доверяет подписи и сроку токена и не читает
+    таблицу сессий.
+    Под ASGI работает асинхронно и проверяет сессию через async ORM,
+    без перехода в поток.
     """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        start_reaper()
+
     def process_request(self, request):
         """
         Обрабатывает входящий запрос, устанавливает пользователя в request.user.
@@ -16,17 +38,170 @@ class CustomAuthenticationMiddleware(MiddlewareMixin):
         """
         if not hasattr(request, 'user') or request.user.is_anonymous:
             request.user = AnonymousUser()
+        token = self.get_token(request)
+        if token is None:
+            return
+        with timed('auth'):
+            if getattr(settings, 'AUTH_STATELESS_TOKENS', False):
+                user = authenticate_token(token)
+            else:
+                user = get_session_store().authenticate(token)
+            if user is not None:
+                request.user = user
+                last_login_buffer.record(user.pk)
 
-        auth_header = request.headers.get('Authorization')
+    async def aprocess_request(self, request):
+        """
+        Асинхронный вариант process_request.
+        """
+        # request.user от AuthenticationMiddleware ленивый и читает сессию
+        # синхронным ORM, поэтому пользователь сессии берется через auser.
+        user = await request.auser() if hasattr(request, 'auser') else None
+        if user is None or user.is_anonymous:
+            user = AnonymousUser()
+        request.user = user
+        token = self.get_token(request)
+        if token is None:
+            return
+        with timed('auth'):
+            if getattr(settings, 'AUTH_STATELESS_TOKENS', False):
+                user = await aauthenticate_token(token)
+            else:
+                user = await get_session_store().aauthenticate(token)
+            if user is not None:
+                request.user = user
+                await last_login_buffer.arecord(user.pk)
 
+    async def __acall__(self, request):
+        await self.aprocess_request(request)
+        return await self.get_response(request)
+
+    @staticmethod
+    def get_token(request):
+        """
+        Возвращает токен из заголовка Authorization или None.
+        """
+        auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                session = Session.objects.select_related('user').get(token=token)
-                if session.is_valid():
-                    request.user = session.user
-                    session.refresh()
-                    session.user.last_login = timezone.now()
-                    session.user.save(update_fields=['last_login'])
-            except Session.DoesNotExist:
-                pass
+            return auth_header.split(' ')[1]
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Middleware для маршрутизации чтений на реплику с учетом
+    read-your-writes. Пользователь, который недавно что-то записал
+    (вход, продление сессии, выход), читает свои сессию и профиль с
+    основной базы в течение AUTH_DB_STICKY_SECONDS.
+    Без настроенной реплики ничего не делает.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not db_routers.replica_enabled():
+            return self.get_response(request)
+        context_token = db_routers.begin_request(self.token_user_id(request))
+        try:
+            return self.get_response(request)
+        finally:
+            db_routers.finish_request(context_token, self.user_id(request))
+
+    async def __acall__(self, request):
+        if not db_routers.replica_enabled():
+            return await self.get_response(request)
+        context_token = db_routers.begin_request(self.token_user_id(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            db_routers.finish_request(context_token, self.user_id(request))
+
+    @staticmethod
+    def token_user_id(request):
+        """
+        Возвращает user_id из подписанного токена без обращения к базе.
+        """
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None
+        payload = decode_token(auth_header.split(' ')[1])
+        return payload.get('user_id') if payload else None
+
+    @staticmethod
+    def user_id(request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        return user.pk
+
+
+class InstrumentationMiddleware:
+    """
+    Middleware для замера запросов: число и время SQL-запросов, время
+    аутентификации, проверки прав и хеширования паролей.
+    Замеряется доля запросов AUTH_INSTRUMENTATION_SAMPLE_RATE; результаты
+    отдаются в заголовке Server-Timing и копятся в гистограммах.
+    Под ASGI SQL-запросы не считаются: async ORM выполняет их в отдельном
+    потоке со своими подключениями.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        metrics, context_token = start_request()
+        wrapper = query_timer(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.add('total', time.perf_counter() - started)
+            finish_request(context_token)
+        response['Server-Timing'] = metrics.server_timing()
+        registry.record(metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        metrics, context_token = start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.add('total', time.perf_counter() - started)
+            finish_request(context_token)
+        response['Server-Timing'] = metrics.server_timing()
+        registry.record(metrics)
+        return response
+
+    @staticmethod
+    def sampled():
+        """
+        Решает, замерять ли текущий запрос.
+        """
+        rate = getattr(settings, 'AUTH_INSTRUMENTATION_SAMPLE_RATE', 0)
+        return bool(rate) and random.random() < rate
+
@@ -0,0 +1,131 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Время события')),
+                ('event', models.CharField(max_length=20, verbose_name='Тип события')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='Id пользователя')),
+                ('element', models.CharField(blank=True, max_length=100, verbose_name='Бизнес-элемент')),
+                ('permission', models.CharField(blank=True, max_length=50, verbose_name='Право')),
+                ('allowed', models.BooleanField(verbose_name='Разрешено')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP-адрес')),
+                ('detail', models.CharField(blank=True, max_length=255, verbose_name='Подробности')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BusinessElement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('parents', models.ManyToManyField(blank=True, related_name='children', to='auth_core.role', verbose_name='Родительские роли')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('first_name', models.CharField(max_length=50, verbose_name='Имя')),
+                ('last_name', models.CharField(max_length=50, verbose_name='Фамилия')),
+                ('patronymic', models.CharField(blank=True, max_length=50, verbose_name='Отчество')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='Email')),
+                ('extra_role_ids', models.TextField(blank=True, default='', editable=False, verbose_name='Id дополнительных ролей')),
+                ('is_staff', models.BooleanField(default=False, verbose_name='Персонал')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('is_superuser', models.BooleanField(default=False, verbose_name='Суперпользователь')),
+                ('failed_login_attempts', models.PositiveIntegerField(default=0, verbose_name='Неудачных попыток входа')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Заблокирован до')),
+                ('session_generation', models.PositiveIntegerField(default=0, verbose_name='Поколение сессий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+                ('role', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='auth_core.role', verbose_name='Роль')),
+                ('roles', models.ManyToManyField(blank=True, related_name='members', to='auth_core.role', verbose_name='Дополнительные роли')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Session',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(blank=True, max_length=500, null=True, verbose_name='Токен (устаревшее поле)')),
+                ('token_hash', models.CharField(max_length=64, null=True, unique=True, verbose_name='SHA-256 токена')),
+                ('jti', models.CharField(blank=True, db_index=True, max_length=32, verbose_name='Идентификатор токена')),
+                ('generation', models.PositiveIntegerField(default=0, verbose_name='Поколение сессий пользователя')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Дата истечения')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mask', models.PositiveIntegerField(default=0, verbose_name='Битовая маска прав')),
+                ('element', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth_core.businesselement', verbose_name='Бизнес-элемент')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to='auth_core.role', verbose_name='Роль')),
+            ],
+            options={
+                'unique_together': {('role', 'element')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AccessRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_permission', models.BooleanField(default=False, verbose_name='Разрешение на чтение')),
+                ('read_all_permission', models.BooleanField(default=False, verbose_name='Разрешение на чтение всех')),
+                ('create_permission', models.BooleanField(default=False, verbose_name='Разрешение на создание')),
+                ('update_permission', models.BooleanField(default=False, verbose_name='Разрешение на изменение')),
+                ('update_all_permission', models.BooleanField(default=False, verbose_name='Разрешение на изменение всех')),
+                ('delete_permission', models.BooleanField(default=False, verbose_name='Разрешение на удаление')),
+                ('delete_all_permission', models.BooleanField(default=False, verbose_name='Разрешение на удаление всех')),
+                ('element', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth_core.businesselement', verbose_name='Бизнес-элемент')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth_core.role', verbose_name='Роль')),
+            ],
+            options={
+                'unique_together': {('role', 'element')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RoleClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0, verbose_name='Глубина')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='auth_core.role', verbose_name='Предок')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='auth_core.role', verbose_name='Потомок')),
+            ],
+            options={
+                'unique_together': {('descendant', 'ancestor')},
+            },
+        ),
+    ]
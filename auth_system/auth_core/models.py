@@ -1,7 +1,11 @@
-from datetime import datetime, timedelta
+import hashlib
+import logging
+import uuid
+from datetime import timedelta
 
-import bcrypt
-from django.db import models
+from django.db import (
+    DEFAULT_DB_ALIAS, connections, models, router, transaction
+)
 from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser, PermissionsMixin, BaseUserManager
@@ -9,12 +13,51 @@ from django.contrib.auth.models import (
 from django.utils import timezone
 import jwt
 
+from .db_routers import record_write
+from .hashing import (
+    HashingPoolBusy, dummy_hash, hash_password, hashing_pool, needs_rehash,
+    verify_password
+)
+
+logger = logging.getLogger(__name__)
+
+SESSION_LIFETIME = timedelta(days=7)
+LOGIN_FIELDS = (
+    'id', 'email', 'password', 'role_id', 'extra_role_ids', 'is_active',
+    'failed_login_attempts', 'locked_until', 'session_generation',
+)
+# Поля, которые пишутся только точечными UPDATE и не перезаписываются
+# полным сохранением пользователя.
+UPDATE_ONLY_FIELDS = ('session_generation', 'extra_role_ids')
+
+
+def login_values(now):
+    """
+    Значения полей пользователя, записываемые при успешном входе.
+    """
+    return {
+        'last_login': now,
+        'failed_login_attempts': 0,
+        'locked_until': None,
+    }
+
+
+def refresh_due(expires_at):
+    """
+    Проверяет, пора ли продлить сессию: с последнего продления прошла
+    доля окна AUTH_SESSION_REFRESH_FRACTION.
+    """
+    fraction = getattr(settings, 'AUTH_SESSION_REFRESH_FRACTION', 0)
+    elapsed = SESSION_LIFETIME - (expires_at - timezone.now())
+    return elapsed >= SESSION_LIFETIME * fraction
+
 
 class Role(models.Model):
     """
     Модель роли пользователя.
     name: Название роли.
     description: Описание роли.
+    parents: Роли, права которых наследует роль.
     """
     name = models.CharField(
         max_length=50, unique=True, verbose_name="Название"
@@ -22,6 +65,10 @@ class Role(models.Model):
     description = models.TextField(
         blank=True, verbose_name="Описание"
     )
+    parents = models.ManyToManyField(
+        'self', symmetrical=False, blank=True, related_name='children',
+        verbose_name="Родительские роли"
+    )
 
     def __str__(self):
         """Строковое представление роли."""
@@ -82,6 +129,49 @@ class AccessRule(models.Model):
         unique_together = ('role', 'element')
 
 
+class RoleClosure(models.Model):
+    """
+    Транзитивное замыкание иерархии ролей.
+    ancestor: Роль-предок (сама роль на глубине 0).
+    descendant: Роль-потомок.
+    depth: Расстояние между ролями в иерархии.
+    """
+    ancestor = models.ForeignKey(
+        Role, on_delete=models.CASCADE, related_name='descendant_links',
+        verbose_name="Предок"
+    )
+    descendant = models.ForeignKey(
+        Role, on_delete=models.CASCADE, related_name='ancestor_links',
+        verbose_name="Потомок"
+    )
+    depth = models.PositiveIntegerField(
+        default=0, verbose_name="Глубина"
+    )
+
+    class Meta:
+        unique_together = ('descendant', 'ancestor')
+
+
+class EffectivePermission(models.Model):
+    """
+    Эффективные права роли на бизнес-элемент с учетом наследования:
+    битовая маска, объединяющая правила роли и всех ее предков.
+    """
+    role = models.ForeignKey(
+        Role, on_delete=models.CASCADE, related_name='effective_permissions',
+        verbose_name="Роль"
+    )
+    element = models.ForeignKey(
+        BusinessElement, on_delete=models.CASCADE, verbose_name="Бизнес-элемент"
+    )
+    mask = models.PositiveIntegerField(
+        default=0, verbose_name="Битовая маска прав"
+    )
+
+    class Meta:
+        unique_together = ('role', 'element')
+
+
 class UserManager(BaseUserManager):
     """
     Кастомный менеджер пользователей.
@@ -113,6 +203,25 @@ class UserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def get_for_login(self, email):
+        """
+        Возвращает активного пользователя для входа или None.
+        Загружаются только поля LOGIN_FIELDS. Читается основная база:
+        реплика может не знать о только что зарегистрированном
+        пользователе или о свежей блокировке.
+        """
+        return self.using(DEFAULT_DB_ALIAS).only(*LOGIN_FIELDS).filter(
+            email=email, is_active=True
+        ).first()
+
+    async def aget_for_login(self, email):
+        """
+        Асинхронный вариант get_for_login.
+        """
+        return await self.using(DEFAULT_DB_ALIAS).only(*LOGIN_FIELDS).filter(
+            email=email, is_active=True
+        ).afirst()
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """
@@ -133,6 +242,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     role = models.ForeignKey(
         Role, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Роль"
     )
+    roles = models.ManyToManyField(
+        Role, blank=True, related_name='members',
+        verbose_name="Дополнительные роли"
+    )
+    # Отсортированные id дополнительных ролей через запятую. Поддерживается
+    # сигналами, чтобы набор ролей был известен без запроса к roles.
+    extra_role_ids = models.TextField(
+        blank=True, default='', editable=False,
+        verbose_name="Id дополнительных ролей"
+    )
     is_staff = models.BooleanField(
         default=False, verbose_name="Персонал"
     )
@@ -142,6 +261,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_superuser = models.BooleanField(
         default=False, verbose_name="Суперпользователь"
     )
+    failed_login_attempts = models.PositiveIntegerField(
+        default=0, verbose_name="Неудачных попыток входа"
+    )
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="Заблокирован до"
+    )
+    # Увеличение поколения отзывает все сессии и токены пользователя.
+    session_generation = models.PositiveIntegerField(
+        default=0, verbose_name="Поколение сессий"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Дата создания"
     )
@@ -152,35 +281,158 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет пользователя. Поколение сессий и набор дополнительных
+        ролей при полном сохранении не записываются: они меняются только
+        в bump_session_generation и sync_extra_role_ids, и устаревший
+        экземпляр из кэша не должен откатить отзыв сессий или изменение
+        ролей.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.attname not in UPDATE_ONLY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def bump_session_generation(self):
+        """
+        Отзывает все сессии и токены пользователя одним UPDATE.
+        Строки сессий остаются в базе до очистки reap_sessions.
+        """
+        from .stateless import publish_session_generation
+
+        User.objects.filter(pk=self.pk).update(
+            session_generation=models.F('session_generation') + 1
+        )
+        record_write(User, self.pk)
+        self.session_generation += 1
+        publish_session_generation(self.pk, self.session_generation)
+
+    async def abump_session_generation(self):
+        """
+        Асинхронный вариант bump_session_generation.
+        """
+        from .stateless import publish_session_generation
+
+        await User.objects.filter(pk=self.pk).aupdate(
+            session_generation=models.F('session_generation') + 1
+        )
+        record_write(User, self.pk)
+        self.session_generation += 1
+        publish_session_generation(self.pk, self.session_generation)
+
+    @property
+    def role_ids(self):
+        """
+        Id всех ролей пользователя: основной и дополнительных.
+        """
+        role_ids = set(map(int, filter(None, self.extra_role_ids.split(','))))
+        if self.role_id is not None:
+            role_ids.add(self.role_id)
+        return role_ids
+
+    @property
+    def role_key(self):
+        """
+        Отпечаток набора ролей для матрицы прав: id роли, если роль одна,
+        frozenset id ролей, если их несколько, или None без ролей.
+        """
+        source = (self.role_id, self.extra_role_ids)
+        cached = self.__dict__.get('_role_key')
+        if cached is not None and cached[0] == source:
+            return cached[1]
+        role_ids = self.role_ids
+        if len(role_ids) > 1:
+            key = frozenset(role_ids)
+        else:
+            key = next(iter(role_ids), None)
+        self._role_key = (source, key)
+        return key
+
     def set_password(self, raw_password):
         """
         Устанавливает пароль пользователя, используя bcrypt.
         """
-        hashed_password = bcrypt.hashpw(
-            raw_password.encode('utf-8'), bcrypt.gensalt()
-        ).decode('utf-8')
-        self.password = hashed_password
+        self.password = hash_password(raw_password)
 
     def check_password(self, raw_password):
         """
         Проверяет пароль пользователя.
+        Если хеш создан с другой стоимостью bcrypt, пароль перехешируется
+        с текущей стоимостью в пуле хеширования, вне пути запроса.
         """
+        is_valid = verify_password(raw_password, self.password)
+        if is_valid and needs_rehash(self.password):
+            self._schedule_rehash(raw_password)
+        return is_valid
+
+    def _schedule_rehash(self, raw_password):
+        """
+        Ставит перехеширование пароля в пул хеширования. Если пул занят,
+        перехеширование пропускается до следующего входа.
+        """
+        if not self.pk:
+            return
         try:
-            return bcrypt.checkpw(
-                raw_password.encode('utf-8'), self.password.encode('utf-8')
+            hashing_pool.submit(
+                rehash_password, self.pk, raw_password, self.password
             )
-        except (ValueError, AttributeError):
-            return False
+        except HashingPoolBusy:
+            pass
+
+    async def aset_password(self, raw_password):
+        """
+        Устанавливает пароль, хешируя его в пуле хеширования.
+        """
+        self.password = await hashing_pool.run(hash_password, raw_password)
+
+    @staticmethod
+    def check_dummy_password(raw_password):
+        """
+        Проверяет пароль по фиктивному хешу, когда пользователь не найден,
+        чтобы ответ занимал столько же времени. Всегда возвращает False.
+        """
+        verify_password(raw_password, dummy_hash())
+        return False
+
+    @staticmethod
+    async def acheck_dummy_password(raw_password):
+        """
+        Асинхронный вариант check_dummy_password.
+        """
+        await hashing_pool.run(verify_password, raw_password, dummy_hash())
+        return False
+
+    async def acheck_password(self, raw_password):
+        """
+        Проверяет пароль в пуле хеширования.
+        """
+        is_valid = await hashing_pool.run(
+            verify_password, raw_password, self.password
+        )
+        if is_valid and needs_rehash(self.password):
+            self._schedule_rehash(raw_password)
+        return is_valid
 
-    def generate_token(self):
+    def generate_token(self, jti=None):
         """
         Генерирует JWT токен для пользователя.
+        :param jti: Идентификатор сессии, по которому токен можно отозвать
         """
+        now = timezone.now()
         payload = {
             'user_id': self.id,
-            'exp': datetime.now() + timedelta(days=7),
-            'iat': datetime.now()
+            'gen': self.session_generation,
+            'exp': now + SESSION_LIFETIME,
+            'iat': now
         }
+        if jti:
+            payload['jti'] = jti
         return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
 
     @staticmethod
@@ -192,7 +444,10 @@ class User(AbstractBaseUser, PermissionsMixin):
             payload = jwt.decode(
                 token, settings.SECRET_KEY, algorithms=['HS256']
             )
-            return User.objects.get(id=payload['user_id'], is_active=True)
+            user = User.objects.get(id=payload['user_id'], is_active=True)
+            if payload.get('gen', 0) < user.session_generation:
+                return None
+            return user
         except (
             jwt.ExpiredSignatureError, jwt.InvalidTokenError, User.DoesNotExist
         ):
@@ -213,6 +468,114 @@ class User(AbstractBaseUser, PermissionsMixin):
         return True
 
 
+def rehash_password(user_id, raw_password, old_hash):
+    """
+    Записывает хеш пароля с текущей стоимостью bcrypt. Выполняется в
+    пуле хеширования; если пароль с тех пор сменили, ничего не меняет.
+    """
+    try:
+        User.objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=user_id, password=old_hash
+        ).update(password=hash_password(raw_password))
+    except Exception:
+        logger.exception('Не удалось перехешировать пароль')
+    finally:
+        # Поток пула не обслуживает запросы, и соединение никто не закроет.
+        connections.close_all()
+
+
+class SessionManager(models.Manager):
+    """
+    Менеджер сессий пользователей.
+    """
+    def build_for_user(self, user):
+        """
+        Создает несохраненную сессию и токен для пользователя.
+        Возвращает пару (сессия, токен).
+        """
+        jti = uuid.uuid4().hex
+        token = user.generate_token(jti=jti)
+        session = self.model(
+            user=user,
+            token_hash=Session.hash_token(token),
+            jti=jti,
+            generation=user.session_generation,
+            expires_at=timezone.now() + SESSION_LIFETIME
+        )
+        return session, token
+
+    def create_for_user(self, user):
+        """
+        Создает сессию и токен для пользователя.
+        Возвращает пару (сессия, токен).
+        """
+        session, token = self.build_for_user(user)
+        session.save(force_insert=True, using=self._db)
+        return session, token
+
+    async def acreate_for_user(self, user):
+        """
+        Асинхронно создает сессию и токен для пользователя.
+        """
+        session, token = self.build_for_user(user)
+        await session.asave(force_insert=True, using=self._db)
+        return session, token
+
+    def create_for_login(self, user):
+        """
+        Создает сессию и отмечает вход пользователя (last_login, сброс
+        неудачных попыток) в одной транзакции.
+        На PostgreSQL обе записи выполняются одним запросом с CTE.
+        Возвращает пару (сессия, токен). Если пользователя уже удалили,
+        сессия не создается и поднимается User.DoesNotExist.
+        """
+        session, token = self.build_for_user(user)
+        session.created_at = session.expires_at - SESSION_LIFETIME
+        using = self._db or router.db_for_write(self.model, instance=session)
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=using):
+                session.save(force_insert=True, using=using)
+                if not User.objects.using(using).filter(pk=user.pk).update(
+                    **login_values(session.created_at)
+                ):
+                    raise User.DoesNotExist('Пользователь удален')
+            record_write(User, user.pk)
+            return session, token
+
+        quote = connection.ops.quote_name
+        columns = (
+            'user_id', 'token_hash', 'jti', 'generation', 'created_at',
+            'expires_at',
+        )
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH new_session AS ('
+                f'INSERT INTO {quote(self.model._meta.db_table)} '
+                f'({", ".join(map(quote, columns))}) '
+                f'VALUES (%s, %s, %s, %s, %s, %s) RETURNING id) '
+                f'UPDATE {quote(User._meta.db_table)} '
+                f'SET last_login = %s, failed_login_attempts = 0, '
+                f'locked_until = NULL WHERE id = %s '
+                f'RETURNING (SELECT id FROM new_session)',
+                [
+                    user.pk, session.token_hash, session.jti,
+                    session.generation, session.created_at, session.expires_at,
+                    session.created_at, user.pk,
+                ]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                # UPDATE не нашел пользователя; исключение откатывает и
+                # вставку сессии.
+                raise User.DoesNotExist('Пользователь удален')
+            session.pk = row[0]
+        record_write(User, user.pk)
+        session._state.adding = False
+        session._state.db = using
+        return session, token
+
+
 class Session(models.Model):
     """
     Модель сессии пользователя.
@@ -221,24 +584,97 @@ class Session(models.Model):
         User, on_delete=models.CASCADE, verbose_name="Пользователь"
     )
     token = models.CharField(
-        max_length=500, unique=True, verbose_name="Токен"
+        max_length=500, null=True, blank=True,
+        verbose_name="Токен (устаревшее поле)"
+    )
+    token_hash = models.CharField(
+        max_length=64, unique=True, null=True,
+        verbose_name="SHA-256 токена"
+    )
+    jti = models.CharField(
+        max_length=32, blank=True, db_index=True,
+        verbose_name="Идентификатор токена"
+    )
+    generation = models.PositiveIntegerField(
+        default=0, verbose_name="Поколение сессий пользователя"
     )
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Дата создания"
     )
     expires_at = models.DateTimeField(
-        verbose_name="Дата истечения"
+        db_index=True, verbose_name="Дата истечения"
     )
+    objects = SessionManager()
+
+    @staticmethod
+    def hash_token(token):
+        """
+        Возвращает SHA-256 токена, по которому ищется сессия.
+        """
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
     def is_valid(self):
         """
-        Проверяет, действительна ли сессия.
+        Проверяет, действительна ли сессия: не истекла, пользователь
+        активен и сессии пользователя не отзывались после ее создания.
         """
-        return self.expires_at > timezone.now() and self.user.is_active
+        return (
+            self.expires_at > timezone.now()
+            and self.user.is_active
+            and self.generation >= self.user.session_generation
+        )
 
-    def refresh(self):
+    def refresh(self, force=False):
         """
-        Обновляет срок действия сессии.
+        Продлевает срок действия сессии.
+        Срок продлевается, только если с последнего продления прошла доля
+        окна AUTH_SESSION_REFRESH_FRACTION. Возвращает True, если сессия
+        была сохранена.
+        """
+        if not force and not refresh_due(self.expires_at):
+            return False
+        self.expires_at = timezone.now() + SESSION_LIFETIME
+        self.save(update_fields=['expires_at'])
+        return True
+
+    async def arefresh(self, force=False):
         """
-        self.expires_at = timezone.now() + timedelta(days=7)
-        self.save()
+        Асинхронный вариант refresh.
+        """
+        if not force and not refresh_due(self.expires_at):
+            return False
+        self.expires_at = timezone.now() + SESSION_LIFETIME
+        await self.asave(update_fields=['expires_at'])
+        return True
+
+
+class AuditEvent(models.Model):
+    """
+    Событие журнала аудита: решение о доступе, вход или выход.
+    Пользователь хранится числом, а не внешним ключом, чтобы записи
+    переживали удаление пользователя.
+    """
+    created_at = models.DateTimeField(
+        db_index=True, verbose_name="Время события"
+    )
+    event = models.CharField(
+        max_length=20, verbose_name="Тип события"
+    )
+    user_id = models.BigIntegerField(
+        null=True, blank=True, verbose_name="Id пользователя"
+    )
+    element = models.CharField(
+        max_length=100, blank=True, verbose_name="Бизнес-элемент"
+    )
+    permission = models.CharField(
+        max_length=50, blank=True, verbose_name="Право"
+    )
+    allowed = models.BooleanField(
+        verbose_name="Разрешено"
+    )
+    ip = models.GenericIPAddressField(
+        null=True, blank=True, verbose_name="IP-адрес"
+    )
+    detail = models.CharField(
+        max_length=255, blank=True, verbose_name="Подробности"
+    )
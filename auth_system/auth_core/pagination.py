@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация по первичному ключу.
+    Каждая страница выбирается условием id > курсор с LIMIT, поэтому время
+    ответа не зависит от номера страницы.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'AUTH_PAGE_SIZE', 100)
@@ -0,0 +1,183 @@
+import threading
+
+from django.core.cache import cache
+
+PERMISSION_TYPES = (
+    'read_permission',
+    'read_all_permission',
+    'create_permission',
+    'update_permission',
+    'update_all_permission',
+    'delete_permission',
+    'delete_all_permission',
+)
+PERMISSION_BITS = {
+    permission_type: 1 << index
+    for index, permission_type in enumerate(PERMISSION_TYPES)
+}
+GENERATION_CACHE_KEY = 'auth_core:permission_matrix:generation'
+
+
+def rule_mask(values):
+    """
+    Собирает битовую маску из флагов правила доступа.
+    :param values: Значения флагов в порядке PERMISSION_TYPES
+    """
+    mask = 0
+    for permission_type, value in zip(PERMISSION_TYPES, values):
+        if value:
+            mask |= PERMISSION_BITS[permission_type]
+    return mask
+
+
+class PermissionMatrix:
+    """
+    Скомпилированная матрица прав (role_key, element_name) -> битовая маска.
+    Строится из таблицы эффективных прав EffectivePermission, где уже
+    учтено наследование ролей. Ключ role_key — id роли или frozenset id
+    ролей пользователя с несколькими ролями; маски набора объединяются
+    по ИЛИ один раз и хранятся в той же матрице под ключом-набором.
+    Хранится в памяти процесса и перестраивается, когда счетчик поколений
+    в общем кэше расходится с локальным.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._masks = None
+        self._element_names = {}
+        self._generation = None
+
+    def get_mask(self, role_key, element_name):
+        """
+        Возвращает маску прав роли или набора ролей на бизнес-элемент.
+        """
+        if role_key is None:
+            return 0
+        return self._role_set_masks(role_key).get(element_name, 0)
+
+    def role_masks(self, role_key):
+        """
+        Возвращает маски прав роли или набора ролей на все
+        бизнес-элементы.
+        """
+        masks = self._role_set_masks(role_key) if role_key is not None else {}
+        role_masks = dict.fromkeys(self._element_names.values(), 0)
+        role_masks.update(masks)
+        return role_masks
+
+    def has_permission(self, role_key, element_name, permission_type):
+        """
+        Проверяет наличие права у роли без обращения к базе данных.
+        """
+        bit = PERMISSION_BITS.get(permission_type, 0)
+        return bool(self.get_mask(role_key, element_name) & bit)
+
+    @property
+    def generation(self):
+        """Текущее поколение матрицы в общем кэше."""
+        return self._shared_generation()
+
+    def apply_roles(self, effective):
+        """
+        Точечно заменяет маски ролей после пересчета эффективных прав.
+        :param effective: Маски {role_id: {element_id: mask}}
+        """
+        with self._lock:
+            patchable = self._is_current()
+            generation = self._bump()
+            names = self._element_names
+            if not patchable or any(
+                element_id not in names
+                for masks in effective.values()
+                for element_id in masks
+            ):
+                self._masks = None
+                return
+            # Объединенные маски наборов ролей могли устареть. Матрица
+            # копируется, чтобы читатели без блокировки не дописали в нее
+            # набор, собранный из старых масок.
+            patched = {
+                key: masks for key, masks in self._masks.copy().items()
+                if not isinstance(key, frozenset)
+            }
+            # Маски роли заменяются целиком, а не дописываются по ключу
+            # (роль, элемент): элемент или роль, с которых правило
+            # перенесли, не сохраняют прежнее право.
+            for role_id, masks in effective.items():
+                patched[role_id] = {
+                    names[element_id]: mask
+                    for element_id, mask in masks.items()
+                    if mask
+                }
+            self._masks = patched
+            self._generation = generation
+
+    def invalidate(self):
+        """
+        Сбрасывает матрицу во всех процессах.
+        """
+        with self._lock:
+            self._bump()
+            self._masks = None
+
+    def _role_set_masks(self, role_key):
+        masks = self._current()
+        merged = masks.get(role_key)
+        if merged is None:
+            merged = {}
+            if isinstance(role_key, frozenset):
+                for role_id in role_key:
+                    for name, mask in masks.get(role_id, {}).items():
+                        merged[name] = merged.get(name, 0) | mask
+                masks[role_key] = merged
+        return merged
+
+    def _current(self):
+        generation = self._shared_generation()
+        masks = self._masks
+        if masks is not None and generation == self._generation:
+            return masks
+        with self._lock:
+            if self._masks is None or self._generation != generation:
+                self._rebuild(generation)
+            return self._masks
+
+    def _is_current(self):
+        return (
+            self._masks is not None
+            and self._generation == self._shared_generation()
+        )
+
+    def _rebuild(self, generation):
+        from .models import BusinessElement, EffectivePermission
+
+        masks = {}
+        element_names = dict(BusinessElement.objects.values_list('id', 'name'))
+        rows = EffectivePermission.objects.values_list(
+            'role_id', 'element_id', 'mask'
+        )
+        for role_id, element_id, mask in rows:
+            if element_id in element_names:
+                masks.setdefault(role_id, {})[element_names[element_id]] = mask
+        self._masks = masks
+        self._element_names = element_names
+        self._generation = generation
+
+    @staticmethod
+    def _shared_generation():
+        generation = cache.get(GENERATION_CACHE_KEY)
+        if generation is None:
+            cache.add(GENERATION_CACHE_KEY, 1, timeout=None)
+            generation = cache.get(GENERATION_CACHE_KEY, 1)
+        return generation
+
+    @staticmethod
+    def _bump():
+        try:
+            return cache.incr(GENERATION_CACHE_KEY)
+        except ValueError:
+            cache.add(GENERATION_CACHE_KEY, 1, timeout=None)
+            return cache.incr(GENERATION_CACHE_KEY)
+
+
+permission_matrix = PermissionMatrix()
@@ -1,5 +1,67 @@
 from rest_framework import permissions
-from .models import BusinessElement, AccessRule
+from .audit import audit_log
+from .instrumentation import timed
+from .permission_matrix import (
+    PERMISSION_BITS, PERMISSION_TYPES, permission_matrix
+)
+from .ratelimit import client_ip
+
+ACTIONS = {
+    permission_type[:-len('_permission')]: permission_type
+    for permission_type in PERMISSION_TYPES
+}
+
+
+def role_key(user):
+    """
+    Возвращает отпечаток набора ролей пользователя для матрицы прав
+    или None, если пользователь неактивен или не имеет ролей.
+    """
+    if not getattr(user, 'is_active', False):
+        return None
+    return getattr(user, 'role_key', getattr(user, 'role_id', None))
+
+
+def get_permission_map(user, checks=None, elements=None, actions=None):
+    """
+    Возвращает карту эффективных прав пользователя
+    {элемент: {действие: bool}}.
+    :param user: Пользователь, для ролей которого вычисляются права
+    :param checks: Список пар (элемент, действие)
+    :param elements: Элементы для проверки, если checks не задан
+    (по умолчанию все)
+    :param actions: Действия для проверки, если checks не задан
+    (по умолчанию все)
+    """
+    masks = permission_matrix.role_masks(role_key(user))
+    if checks is None:
+        checks = [
+            (element, action)
+            for element in (elements or masks)
+            for action in (actions or ACTIONS)
+        ]
+    result = {}
+    for element, action in checks:
+        bit = PERMISSION_BITS[ACTIONS[action]]
+        result.setdefault(element, {})[action] = bool(
+            masks.get(element, 0) & bit
+        )
+    return result
+
+
+def ownership_scope(user, element_name, action):
+    """
+    Определяет, к каким объектам бизнес-элемента у пользователя есть
+    доступ на действие.
+    Возвращает 'all' при праве <action>_all, 'own' при праве только на
+    свои объекты и None, если права нет.
+    """
+    mask = permission_matrix.get_mask(role_key(user), element_name)
+    if mask & PERMISSION_BITS.get(f'{action}_all_permission', 0):
+        return 'all'
+    if mask & PERMISSION_BITS.get(f'{action}_permission', 0):
+        return 'own'
+    return None
 
 
 class HasPermission(permissions.BasePermission):
@@ -22,40 +84,55 @@ class HasPermission(permissions.BasePermission):
         """
         Проверяет разрешение на уровне запроса.
         """
+        allowed = self._allowed(request)
+        self._audit(request, allowed)
+        return allowed
+
+    def has_object_permission(self, request, view, obj):
+        """
+        Проверяет разрешение на уровне объекта.
+        """
+        allowed = self._allowed(request) and self._owns(request, obj)
+        self._audit(request, allowed, f"object:{getattr(obj, 'pk', '')}")
+        return allowed
+
+    def _allowed(self, request):
         if not request.user or not request.user.is_active:
             return False
 
         if self.permission_type == 'create_permission':
             self.check_ownership = False
 
-        try:
-            element = BusinessElement.objects.get(name=self.element_name)
-            access_rule = AccessRule.objects.get(
-                role=request.user.role, element=element
+        with timed('permission'):
+            return permission_matrix.has_permission(
+                role_key(request.user),
+                self.element_name,
+                self.permission_type
             )
-            return getattr(access_rule, self.permission_type, False)
-        except (BusinessElement.DoesNotExist, AccessRule.DoesNotExist):
-            return False
 
-    def has_object_permission(self, request, view, obj):
-        """
-        Проверяет разрешение на уровне объекта.
-        """
-        if not self.has_permission(request, view):
-            return False
-
-        # Если проверяем владение и у объекта есть владелец
-        if self.check_ownership and hasattr(obj, 'owner'):
+    def _owns(self, request, obj):
+        # Если проверяем владение и у объекта есть владелец. Поле ищется
+        # на классе: hasattr(obj, 'owner') загрузил бы владельца из базы.
+        if self.check_ownership and hasattr(type(obj), 'owner'):
             # Для всех прав проверяем, является ли пользователь владельцем
             if self.permission_type in [
                 'read_all_permission', 'update_all_permission',
                 'delete_all_permission'
             ]:
                 return True
+            if hasattr(type(obj), 'owner_id'):
+                return obj.owner_id == request.user.pk
             return obj.owner == request.user
 
         return True
 
+    def _audit(self, request, allowed, detail=''):
+        audit_log.record(
+            'permission', getattr(request.user, 'pk', None), allowed,
+            self.element_name, self.permission_type, client_ip(request),
+            detail
+        )
+
 
 class CanReadUsers(HasPermission):
     """
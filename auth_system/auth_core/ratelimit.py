@@ -0,0 +1,259 @@
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .db_routers import record_write
+
+RATE_LIMIT_CACHE_PREFIX = 'auth_core:ratelimit:'
+THROTTLED_MESSAGE = 'Слишком много попыток входа, повторите позже'
+
+
+class LocalCounterStore:
+    """
+    Хранилище счетчиков в памяти процесса.
+    Для каждого ключа хранит времена попыток внутри окна (точное
+    скользящее окно). Подходит для одного процесса.
+    Раз в окно ключи, у которых все попытки вышли из окна, удаляются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._next_sweep = 0
+
+    def hit(self, key, limit, window):
+        """
+        Засчитывает попытку, если лимит не превышен.
+        Возвращает 0 или число секунд до освобождения окна.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+                self._next_sweep = now + window
+            hits = self._hits.setdefault(key, (window, deque()))[1]
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                return hits[0] + window - now
+            hits.append(now)
+            return 0
+
+    def _sweep(self, now):
+        stale = [
+            key for key, (window, hits) in self._hits.items()
+            if not hits or hits[-1] <= now - window
+        ]
+        for key in stale:
+            del self._hits[key]
+
+    def reset(self, key, window):
+        """
+        Сбрасывает счетчик ключа.
+        """
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+class CacheCounterStore:
+    """
+    Хранилище счетчиков в кэше Django (AUTH_LOGIN_RATE_LIMIT_CACHE_ALIAS),
+    общее для всех процессов.
+    Скользящее окно приближается двумя соседними фиксированными окнами:
+    счетчик прошлого окна учитывается с весом непрошедшей его доли.
+    """
+
+    @property
+    def cache(self):
+        """Кэш, в котором хранятся счетчики."""
+        return caches[getattr(
+            settings, 'AUTH_LOGIN_RATE_LIMIT_CACHE_ALIAS', 'default'
+        )]
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index, offset = divmod(now, window)
+        current_key = f'{RATE_LIMIT_CACHE_PREFIX}{key}:{int(index)}'
+        previous_key = f'{RATE_LIMIT_CACHE_PREFIX}{key}:{int(index) - 1}'
+        counts = self.cache.get_many([current_key, previous_key])
+        weight = 1 - offset / window
+        estimate = (
+            counts.get(previous_key, 0) * weight
+            + counts.get(current_key, 0)
+        )
+        if estimate >= limit:
+            return window - offset
+        self.cache.add(current_key, 0, timeout=int(window * 2) + 1)
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            self.cache.set(current_key, 1, timeout=int(window * 2) + 1)
+        return 0
+
+    def reset(self, key, window):
+        index = int(time.time() // window)
+        self.cache.delete_many([
+            f'{RATE_LIMIT_CACHE_PREFIX}{key}:{index}',
+            f'{RATE_LIMIT_CACHE_PREFIX}{key}:{index - 1}',
+        ])
+
+
+def get_login_limits():
+    """
+    Лимиты попыток входа {область: (попыток, окно в секундах)}.
+    Области: email и ip.
+    """
+    return getattr(settings, 'AUTH_LOGIN_RATE_LIMITS', {})
+
+
+class LoginRateLimiter:
+    """
+    Ограничитель попыток входа по email и по IP-адресу.
+    Проверяется до поиска пользователя и проверки пароля, поэтому
+    перебор не расходует bcrypt.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def check(self, email, ip):
+        """
+        Засчитывает попытку входа.
+        Возвращает 0, если попытка разрешена, иначе число секунд,
+        через которое можно повторить.
+        """
+        # IP проверяется первым, чтобы запросы, отклоненные по IP, не
+        # расходовали лимит email владельца аккаунта.
+        for scope, value in (('ip', ip), ('email', email)):
+            limit = get_login_limits().get(scope)
+            if not limit or not value:
+                continue
+            retry_after = self.store.hit(self._key(scope, value), *limit)
+            if retry_after:
+                return retry_after
+        return 0
+
+    def reset(self, email):
+        """
+        Сбрасывает счетчик email после успешного входа.
+        """
+        limit = get_login_limits().get('email')
+        if limit and email:
+            self.store.reset(self._key('email', email), limit[1])
+
+    @staticmethod
+    def _key(scope, value):
+        digest = hashlib.sha1(value.lower().encode('utf-8')).hexdigest()
+        return f'{scope}:{digest}'
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_login_rate_limiter():
+    """
+    Возвращает ограничитель с хранилищем AUTH_LOGIN_RATE_LIMIT_STORE.
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                store_class = import_string(getattr(
+                    settings, 'AUTH_LOGIN_RATE_LIMIT_STORE',
+                    'auth_core.ratelimit.LocalCounterStore'
+                ))
+                _limiter = LoginRateLimiter(store_class())
+    return _limiter
+
+
+@receiver(setting_changed)
+def reset_login_rate_limiter(setting, **kwargs):
+    """
+    Сбрасывает ограничитель при изменении настроек в тестах.
+    """
+    global _limiter
+    if setting.startswith('AUTH_LOGIN_RATE_LIMIT'):
+        _limiter = None
+
+
+def client_ip(request):
+    """
+    Возвращает IP-адрес клиента, если он известен.
+    """
+    meta = getattr(request, 'META', None)
+    return meta.get('REMOTE_ADDR') if meta else None
+
+
+def lockout_remaining(user):
+    """
+    Возвращает число секунд до снятия блокировки пользователя или 0.
+    """
+    if user.locked_until is None:
+        return 0
+    return max((user.locked_until - timezone.now()).total_seconds(), 0)
+
+
+def _lockout_until(attempts):
+    """
+    Время снятия блокировки после attempts неудач подряд или None, если
+    порог AUTH_LOGIN_LOCKOUT_THRESHOLD не достигнут.
+    """
+    threshold = getattr(settings, 'AUTH_LOGIN_LOCKOUT_THRESHOLD', 10)
+    if not threshold or attempts < threshold:
+        return None
+    # Каждая следующая неудача после порога удваивает блокировку.
+    seconds = min(
+        getattr(settings, 'AUTH_LOGIN_LOCKOUT_BASE', 60)
+        * 2 ** (attempts - threshold),
+        getattr(settings, 'AUTH_LOGIN_LOCKOUT_MAX', 3600)
+    )
+    return timezone.now() + timedelta(seconds=seconds)
+
+
+def record_failed_login(user):
+    """
+    Увеличивает счетчик неудачных входов и при достижении
+    AUTH_LOGIN_LOCKOUT_THRESHOLD блокирует пользователя.
+    Порог сравнивается со счетчиком в базе после атомарного увеличения,
+    а не с прочитанным при входе: параллельные неудачи не теряются.
+    """
+    users = type(user).objects.using(DEFAULT_DB_ALIAS).filter(pk=user.pk)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        users.update(failed_login_attempts=F('failed_login_attempts') + 1)
+        # Строка заблокирована обновлением до конца транзакции, поэтому
+        # читается значение именно этой неудачи.
+        attempts = users.values_list(
+            'failed_login_attempts', flat=True
+        ).first()
+        locked_until = _lockout_until(attempts or 0)
+        if locked_until is not None:
+            users.update(locked_until=locked_until)
+    record_write(type(user), user.pk)
+
+
+async def arecord_failed_login(user):
+    """
+    Асинхронный вариант record_failed_login.
+    """
+    await sync_to_async(record_failed_login)(user)
+
+
+def retry_after_header(seconds):
+    """
+    Значение заголовка Retry-After в целых секундах.
+    """
+    return str(max(math.ceil(seconds), 1))
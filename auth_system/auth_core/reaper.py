@@ -0,0 +1,78 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+
+
+def reap_expired_sessions(batch_size=1000, pause=0.0, max_batches=None):
+    """
+    Удаляет истекшие сессии и сессии, отозванные увеличением поколения
+    сессий пользователя, пакетами ограниченного размера. Каждый пакет
+    удаляется отдельным коротким запросом, чтобы не держать долгую
+    блокировку на запись. Истекшие сессии ищутся по индексу expires_at,
+    отозванные — отдельным проходом с соединением с таблицей
+    пользователей.
+    :param batch_size: Максимальное количество строк в одном DELETE
+    :param pause: Пауза между пакетами в секундах
+    :param max_batches: Ограничение на количество пакетов за запуск
+    :return: Количество удаленных сессий
+    """
+    from .models import Session
+
+    passes = (
+        Session.objects.filter(expires_at__lt=timezone.now())
+        .order_by('expires_at'),
+        Session.objects.filter(generation__lt=F('user__session_generation'))
+        .order_by('pk'),
+    )
+    reclaimed = 0
+    batches = 0
+    for stale in passes:
+        while max_batches is None or batches < max_batches:
+            pks = list(stale.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted, _ = Session.objects.filter(pk__in=pks).delete()
+            reclaimed += deleted
+            batches += 1
+            if len(pks) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return reclaimed
+
+
+def run_reaper():
+    """
+    Один запуск фоновой очистки с параметрами из настроек.
+    """
+    reclaimed = reap_expired_sessions(
+        batch_size=getattr(settings, 'AUTH_SESSION_REAPER_BATCH_SIZE', 1000),
+        pause=getattr(settings, 'AUTH_SESSION_REAPER_PAUSE', 0.1),
+        max_batches=getattr(settings, 'AUTH_SESSION_REAPER_MAX_BATCHES', 100)
+    )
+    logger.info('Удалено истекших сессий: %s', reclaimed)
+    return reclaimed
+
+
+def start_reaper():
+    """
+    Запускает фоновую очистку, если задан AUTH_SESSION_REAPER_INTERVAL.
+    """
+    global _worker
+    interval = getattr(settings, 'AUTH_SESSION_REAPER_INTERVAL', None)
+    if not interval or _worker is not None:
+        return _worker
+    _worker = PeriodicWorker(
+        'auth-session-reaper', interval, run_reaper, call_on_stop=False
+    )
+    _worker.start()
+    return _worker
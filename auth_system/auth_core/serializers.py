@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from .hierarchy import creates_cycle
 from .models import User, Role, BusinessElement, AccessRule
+from .permissions import ACTIONS
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -35,6 +37,39 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class UserImportSerializer(UserRegistrationSerializer):
+    """
+    Сериализатор строки массового импорта пользователей.
+    Принимает открытый пароль или готовый bcrypt-хеш password_hash.
+    Уникальность email проверяется пакетно при импорте.
+    """
+    password = serializers.CharField(
+        write_only=True, required=False, allow_blank=True
+    )
+    password_confirm = None
+    password_hash = serializers.RegexField(
+        r'^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$',
+        write_only=True, required=False, allow_blank=True
+    )
+
+    class Meta(UserRegistrationSerializer.Meta):
+        fields = (
+            'first_name', 'last_name', 'patronymic', 'email',
+            'password', 'password_hash'
+        )
+        extra_kwargs = {'email': {'validators': []}}
+
+    def validate(self, data):
+        """
+        Проверяет, что задан пароль или его bcrypt-хеш.
+        """
+        if not data.get('password') and not data.get('password_hash'):
+            raise serializers.ValidationError(
+                "Нужен password или password_hash"
+            )
+        return data
+
+
 class UserLoginSerializer(serializers.Serializer):
     """
     Сериализатор для входа пользователя.
@@ -52,7 +87,26 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         fields = ('first_name', 'last_name')
 
 
-class RoleSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Позволяет ограничить набор полей сериализатора (fields) и раскрыть
+    связанные объекты вложенными сериализаторами (expand).
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in expand:
+            if name in self.fields and name in self.expandable_fields:
+                self.fields[name] = self.expandable_fields[name](
+                    read_only=True
+                )
+
+
+class RoleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели роли.
     """
@@ -60,8 +114,20 @@ class RoleSerializer(serializers.ModelSerializer):
         model = Role
         fields = '__all__'
 
+    def validate_parents(self, value):
+        """
+        Запрещает циклы в иерархии ролей.
+        """
+        if self.instance is not None and creates_cycle(self.instance, value):
+            raise serializers.ValidationError(
+                'Роль не может наследовать саму себя или своего потомка'
+            )
+        return value
+
 
-class BusinessElementSerializer(serializers.ModelSerializer):
+class BusinessElementSerializer(
+    DynamicFieldsMixin, serializers.ModelSerializer
+):
     """
     Сериализатор для модели бизнес-элемента.
     """
@@ -70,10 +136,107 @@ class BusinessElementSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class AccessRuleSerializer(serializers.ModelSerializer):
+class AccessRuleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели правила доступа.
+    Роль и бизнес-элемент можно раскрыть параметром expand.
     """
+    expandable_fields = {
+        'role': RoleSerializer,
+        'element': BusinessElementSerializer,
+    }
+
     class Meta:
         model = AccessRule
         fields = '__all__'
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PK-поле для массовых операций: связанные объекты всего пакета
+    (context['bulk_items']) загружаются одним запросом.
+    """
+    def to_internal_value(self, data):
+        items = self.context.get('bulk_items')
+        if items is None:
+            return super().to_internal_value(data)
+        related = self.context.setdefault('bulk_related', {})
+        if self.field_name not in related:
+            ids = set()
+            for item in items:
+                try:
+                    ids.add(int(item.get(self.field_name)))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            related[self.field_name] = self.get_queryset().in_bulk(ids)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = related[self.field_name].get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class BulkRoleSerializer(RoleSerializer):
+    """
+    Сериализатор роли для массового upsert.
+    Уникальность имени не проверяется: существующие роли обновляются.
+    """
+    class Meta(RoleSerializer.Meta):
+        fields = ('id', 'name', 'description')
+        extra_kwargs = {'name': {'validators': []}}
+
+
+class BulkBusinessElementSerializer(BusinessElementSerializer):
+    """
+    Сериализатор бизнес-элемента для массового upsert.
+    """
+    class Meta(BusinessElementSerializer.Meta):
+        extra_kwargs = {'name': {'validators': []}}
+
+
+class BulkAccessRuleSerializer(AccessRuleSerializer):
+    """
+    Сериализатор правила доступа для массового upsert.
+    Уникальность пары (role, element) не проверяется: существующие
+    правила обновляются.
+    """
+    role = BulkPrimaryKeyRelatedField(queryset=Role.objects.all())
+    element = BulkPrimaryKeyRelatedField(
+        queryset=BusinessElement.objects.all()
+    )
+
+    class Meta(AccessRuleSerializer.Meta):
+        validators = []
+
+
+class PermissionCheckSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса массовой проверки прав.
+    Принимает либо список пар checks, либо списки elements и actions.
+    """
+    checks = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.CharField(), min_length=2, max_length=2
+        ),
+        required=False
+    )
+    elements = serializers.ListField(
+        child=serializers.CharField(), required=False
+    )
+    actions = serializers.ListField(
+        child=serializers.ChoiceField(choices=list(ACTIONS)), required=False
+    )
+
+    def validate_checks(self, value):
+        """
+        Проверяет, что действия в парах известны.
+        """
+        unknown = {action for element, action in value} - set(ACTIONS)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Неизвестные действия: {', '.join(sorted(unknown))}"
+            )
+        return [tuple(pair) for pair in value]
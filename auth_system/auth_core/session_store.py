@@ -0,0 +1,420 @@
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .background import PeriodicWorker
+from .db_routers import record_write
+from .last_login import last_login_buffer
+from .models import SESSION_LIFETIME, Session, User, login_values, refresh_due
+from .stateless import (
+    generation_revoked, revocation_state, token_denylist, user_cache
+)
+
+SESSION_CACHE_PREFIX = 'auth_core:session:'
+
+
+class BaseSessionStore:
+    """
+    Базовый класс хранилища сессий.
+    Хранилище создает сессии при входе, проверяет токены в middleware
+    и удаляет сессии при выходе.
+    """
+
+    def create(self, user):
+        """
+        Создает сессию для пользователя и возвращает токен.
+        """
+        raise NotImplementedError
+
+    def authenticate(self, token):
+        """
+        Возвращает пользователя по токену, продлевая сессию при
+        необходимости, или None, если сессия не найдена или истекла.
+        """
+        raise NotImplementedError
+
+    def delete(self, token):
+        """
+        Завершает сессию по токену.
+        """
+        raise NotImplementedError
+
+    def delete_for_user(self, user):
+        """
+        Завершает все сессии пользователя увеличением поколения сессий:
+        один UPDATE вместо удаления каждой сессии. Сессии прежнего
+        поколения перестают проходить проверку и удаляются reap_sessions.
+        """
+        user.bump_session_generation()
+
+    def create_for_login(self, user):
+        """
+        Создает сессию при входе и в той же транзакции записывает
+        last_login и сбрасывает счетчик неудачных попыток.
+        Возвращает токен. Если пользователя уже удалили, поднимает
+        User.DoesNotExist.
+        """
+        with transaction.atomic():
+            if not User.objects.filter(pk=user.pk).update(
+                **login_values(timezone.now())
+            ):
+                raise User.DoesNotExist('Пользователь удален')
+            token = self.create(user)
+        record_write(User, user.pk)
+        # Отложенная отметка из middleware старше только что записанной.
+        last_login_buffer.discard(user.pk)
+        return token
+
+    async def acreate(self, user):
+        """
+        Асинхронный вариант create.
+        """
+        return await sync_to_async(self.create)(user)
+
+    async def acreate_for_login(self, user):
+        """
+        Асинхронный вариант create_for_login.
+        """
+        return await sync_to_async(self.create_for_login)(user)
+
+    async def aauthenticate(self, token):
+        """
+        Асинхронный вариант authenticate.
+        """
+        return await sync_to_async(self.authenticate)(token)
+
+    async def adelete(self, token):
+        """
+        Асинхронный вариант delete.
+        """
+        await sync_to_async(self.delete)(token)
+
+    async def adelete_for_user(self, user):
+        """
+        Асинхронный вариант delete_for_user.
+        """
+        await user.abump_session_generation()
+
+
+class DBSessionStore(BaseSessionStore):
+    """
+    Хранилище сессий в таблице Session.
+    """
+
+    def create(self, user):
+        session, token = Session.objects.create_for_user(user)
+        return token
+
+    def create_for_login(self, user):
+        session, token = Session.objects.create_for_login(user)
+        last_login_buffer.discard(user.pk)
+        return token
+
+    def authenticate(self, token):
+        try:
+            session = Session.objects.select_related('user').get(
+                token_hash=Session.hash_token(token)
+            )
+        except Session.DoesNotExist:
+            return None
+        if not session.is_valid():
+            return None
+        session.refresh()
+        return session.user
+
+    def delete(self, token):
+        token_denylist.revoke_token(token)
+        Session.objects.filter(token_hash=Session.hash_token(token)).delete()
+        record_write(Session)
+
+    async def acreate(self, user):
+        session, token = await Session.objects.acreate_for_user(user)
+        return token
+
+    async def aauthenticate(self, token):
+        try:
+            session = await Session.objects.select_related('user').aget(
+                token_hash=Session.hash_token(token)
+            )
+        except Session.DoesNotExist:
+            return None
+        if not session.is_valid():
+            return None
+        await session.arefresh()
+        return session.user
+
+    async def adelete(self, token):
+        token_denylist.revoke_token(token)
+        await Session.objects.filter(
+            token_hash=Session.hash_token(token)
+        ).adelete()
+        record_write(Session)
+
+
+class CacheSessionStore(BaseSessionStore):
+    """
+    Хранилище сессий в кэше Django (AUTH_SESSION_CACHE_ALIAS).
+    Запись сессии живет в кэше до истечения срока; пользователь
+    загружается через LRU-кэш пользователей.
+    """
+
+    @property
+    def cache(self):
+        """Кэш, в котором хранятся сессии."""
+        return caches[getattr(settings, 'AUTH_SESSION_CACHE_ALIAS', 'default')]
+
+    def create(self, user):
+        session, token = Session.objects.build_for_user(user)
+        self._store(
+            session.token_hash, user.pk, session.jti, session.generation,
+            session.expires_at
+        )
+        if not user.get_deferred_fields():
+            user_cache.put(user)
+        self._created(session)
+        return token
+
+    def authenticate(self, token):
+        token_hash = Session.hash_token(token)
+        data = self._load(token_hash)
+        expires_at = self._expires_at(data)
+        if expires_at is None:
+            return None
+        # Отзыв jti проверяется и здесь: другой процесс мог вернуть
+        # сессию в кэш из базы уже после выхода.
+        revoked, published, version = revocation_state(
+            data['user_id'], data.get('jti')
+        )
+        if revoked:
+            return None
+        user = user_cache.get(data['user_id'], version)
+        if user is None or self._revoked(data, user, published):
+            return None
+        if refresh_due(expires_at):
+            self._refresh(token_hash, data)
+        return user
+
+    async def aauthenticate(self, token):
+        token_hash = Session.hash_token(token)
+        data = await self._aload(token_hash)
+        expires_at = self._expires_at(data)
+        if expires_at is None:
+            return None
+        revoked, published, version = revocation_state(
+            data['user_id'], data.get('jti')
+        )
+        if revoked:
+            return None
+        user = await user_cache.aget(data['user_id'], version)
+        if user is None or self._revoked(data, user, published):
+            return None
+        if refresh_due(expires_at):
+            # Продление бывает редко, а HybridSessionStore может при этом
+            # писать в базу синхронно.
+            await sync_to_async(self._refresh)(token_hash, data)
+        return user
+
+    def delete(self, token):
+        token_denylist.revoke_token(token)
+        self.cache.delete(SESSION_CACHE_PREFIX + Session.hash_token(token))
+
+    def _load(self, token_hash):
+        return self.cache.get(SESSION_CACHE_PREFIX + token_hash)
+
+    async def _aload(self, token_hash):
+        return self._load(token_hash)
+
+    @staticmethod
+    def _expires_at(data):
+        if data is None:
+            return None
+        expires_at = datetime.fromtimestamp(data['expires_at'], dt_timezone.utc)
+        if expires_at <= timezone.now():
+            return None
+        return expires_at
+
+    @staticmethod
+    def _revoked(data, user, published):
+        return generation_revoked(data.get('generation', 0), user, published)
+
+    def _refresh(self, token_hash, data):
+        expires_at = timezone.now() + SESSION_LIFETIME
+        self._store(
+            token_hash, data['user_id'], data['jti'],
+            data.get('generation', 0), expires_at
+        )
+        self._refreshed(token_hash, expires_at)
+
+    def _store(self, token_hash, user_id, jti, generation, expires_at):
+        timeout = max(int((expires_at - timezone.now()).total_seconds()), 1)
+        self.cache.set(
+            SESSION_CACHE_PREFIX + token_hash,
+            {
+                'user_id': user_id,
+                'jti': jti,
+                'generation': generation,
+                'expires_at': expires_at.timestamp(),
+            },
+            timeout=timeout
+        )
+
+    def _created(self, session):
+        """Вызывается после создания сессии в кэше."""
+
+    def _refreshed(self, token_hash, expires_at):
+        """Вызывается после продления сессии в кэше."""
+
+
+class HybridSessionStore(CacheSessionStore):
+    """
+    Write-through хранилище: сессии проверяются по кэшу, а изменения
+    асинхронно записываются в таблицу Session раз в
+    AUTH_SESSION_PERSIST_INTERVAL секунд. При промахе кэша сессия
+    читается из базы и возвращается в кэш.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._creates = {}
+        self._refreshes = {}
+        self._deletes = set()
+        self._worker = None
+
+    def delete(self, token):
+        super().delete(token)
+        token_hash = Session.hash_token(token)
+        with self._lock:
+            self._creates.pop(token_hash, None)
+            self._refreshes.pop(token_hash, None)
+            self._deletes.add(token_hash)
+        self._schedule()
+
+    def flush(self):
+        """
+        Записывает накопленные изменения в таблицу Session.
+        Возвращает количество обработанных операций.
+        """
+        with self._lock:
+            creates, self._creates = self._creates, {}
+            refreshes, self._refreshes = self._refreshes, {}
+            deletes, self._deletes = self._deletes, set()
+        for token_hash, expires_at in list(refreshes.items()):
+            if token_hash in creates:
+                creates[token_hash].expires_at = refreshes.pop(token_hash)
+        try:
+            with transaction.atomic():
+                if creates:
+                    Session.objects.bulk_create(
+                        creates.values(), ignore_conflicts=True
+                    )
+                for token_hash, expires_at in refreshes.items():
+                    Session.objects.filter(token_hash=token_hash).update(
+                        expires_at=expires_at
+                    )
+                if deletes:
+                    Session.objects.filter(token_hash__in=deletes).delete()
+        except Exception:
+            with self._lock:
+                for token_hash, session in creates.items():
+                    self._creates.setdefault(token_hash, session)
+                for token_hash, expires_at in refreshes.items():
+                    self._refreshes.setdefault(token_hash, expires_at)
+                self._deletes |= deletes
+            raise
+        return len(creates) + len(refreshes) + len(deletes)
+
+    def _load(self, token_hash):
+        data = super()._load(token_hash)
+        if data is not None:
+            return data
+        with self._lock:
+            if token_hash in self._deletes:
+                return None
+        session = Session.objects.filter(
+            token_hash=token_hash, expires_at__gt=timezone.now()
+        ).first()
+        return self._restore(token_hash, session)
+
+    async def _aload(self, token_hash):
+        data = super()._load(token_hash)
+        if data is not None:
+            return data
+        with self._lock:
+            if token_hash in self._deletes:
+                return None
+        session = await Session.objects.filter(
+            token_hash=token_hash, expires_at__gt=timezone.now()
+        ).afirst()
+        return self._restore(token_hash, session)
+
+    def _restore(self, token_hash, session):
+        # Удаление строки Session после выхода могло еще не дойти до базы
+        # из очереди другого процесса, а jti уже отозван.
+        if session is None or token_denylist.is_revoked(session.jti):
+            return None
+        self._store(
+            token_hash, session.user_id, session.jti, session.generation,
+            session.expires_at
+        )
+        return super()._load(token_hash)
+
+    def _created(self, session):
+        with self._lock:
+            self._creates[session.token_hash] = session
+        self._schedule()
+
+    def _refreshed(self, token_hash, expires_at):
+        with self._lock:
+            self._refreshes[token_hash] = expires_at
+        self._schedule()
+
+    def _schedule(self):
+        interval = getattr(settings, 'AUTH_SESSION_PERSIST_INTERVAL', 1)
+        if not interval:
+            self.flush()
+            return
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = PeriodicWorker(
+                        'auth-session-persist', interval, self.flush
+                    )
+            self._worker.start()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """
+    Возвращает хранилище сессий, заданное настройкой AUTH_SESSION_STORE.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store_class = import_string(getattr(
+                    settings, 'AUTH_SESSION_STORE',
+                    'auth_core.session_store.DBSessionStore'
+                ))
+                _store = store_class()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_session_store(setting, **kwargs):
+    """
+    Сбрасывает хранилище сессий при изменении настроек в тестах.
+    """
+    global _store
+    if setting in ('AUTH_SESSION_STORE', 'AUTH_SESSION_CACHE_ALIAS'):
+        _store = None
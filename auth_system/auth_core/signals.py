@@ -1,6 +1,15 @@
-from django.db.models.signals import post_migrate
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+)
 from django.dispatch import receiver
-from .models import Role, BusinessElement, AccessRule
+from .db_routers import record_write
+from .hierarchy import PRIMARY, descendants, rebuild_all, recompute_roles
+from .models import Role, BusinessElement, AccessRule, User
+from .permission_matrix import permission_matrix
+from .stateless import publish_user_change
 
 
 @receiver(post_migrate)
@@ -59,3 +68,193 @@ def create_initial_data(sender, **kwargs):
                 'delete_all_permission': True
             }
         )
+
+        # Замыкание и эффективные права всех ролей, в том числе созданных
+        # до появления иерархии.
+        rebuild_all()
+        transaction.on_commit(permission_matrix.invalidate)
+
+
+def apply_recomputed(role_ids, hierarchy_changed=True):
+    """
+    Пересчитывает эффективные права ролей и их потомков в текущей
+    транзакции и точечно обновляет матрицу прав после фиксации.
+    """
+    effective = recompute_roles(role_ids, hierarchy_changed)
+    if effective:
+        transaction.on_commit(lambda: permission_matrix.apply_roles(effective))
+
+
+@receiver(pre_save, sender=AccessRule)
+def remember_rule_role(sender, instance, **kwargs):
+    """
+    Запоминает роль, к которой правило привязано в базе: правило можно
+    перенести на другую роль, и прежняя роль должна потерять его права.
+    """
+    instance._stored_role_id = None
+    if instance.pk is not None:
+        instance._stored_role_id = AccessRule.objects.using(PRIMARY).filter(
+            pk=instance.pk
+        ).values_list('role_id', flat=True).first()
+
+
+@receiver(post_save, sender=AccessRule)
+@receiver(post_delete, sender=AccessRule)
+def recompute_rule_role(sender, instance, **kwargs):
+    """
+    Пересчитывает эффективные права роли правила, ее прежней роли
+    (если правило перенесли) и их потомков.
+    """
+    role_ids = {instance.role_id}
+    stored_role_id = getattr(instance, '_stored_role_id', None)
+    if stored_role_id is not None:
+        role_ids.add(stored_role_id)
+    apply_recomputed(role_ids, hierarchy_changed=False)
+
+
+@receiver(post_save, sender=Role)
+def recompute_created_role(sender, instance, created, **kwargs):
+    """
+    Добавляет новую роль в таблицу замыкания.
+    """
+    if created:
+        apply_recomputed([instance.pk])
+
+
+@receiver(m2m_changed, sender=Role.parents.through)
+def recompute_role_parents(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """
+    Пересчитывает замыкание и права при изменении родителей роли.
+    """
+    if action == 'pre_clear' and reverse:
+        # После очистки со стороны родителя список детей уже не получить.
+        instance._cleared_children = list(
+            instance.children.values_list('pk', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        role_ids = [instance.pk]
+    elif action == 'post_clear':
+        role_ids = getattr(instance, '_cleared_children', [])
+    else:
+        role_ids = pk_set
+    if role_ids:
+        apply_recomputed(role_ids)
+
+
+def sync_extra_role_ids(user_ids):
+    """
+    Переписывает User.extra_role_ids по таблице связей User.roles
+    и после фиксации сообщает всем процессам об изменении пользователей.
+    """
+    role_ids = {user_id: [] for user_id in user_ids}
+    rows = User.roles.through.objects.filter(
+        user_id__in=role_ids
+    ).order_by('role_id').values_list('user_id', 'role_id')
+    for user_id, role_id in rows:
+        role_ids[user_id].append(str(role_id))
+    for user_id, ids in role_ids.items():
+        User.objects.filter(pk=user_id).update(extra_role_ids=','.join(ids))
+        record_write(User, user_id)
+        transaction.on_commit(partial(publish_user_change, user_id))
+    return role_ids
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def sync_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Обновляет набор ролей пользователей при изменении User.roles.
+    """
+    if action == 'pre_clear' and reverse:
+        # После очистки со стороны роли список ее пользователей уже
+        # не получить.
+        instance._cleared_members = list(
+            instance.members.values_list('pk', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        role_ids = sync_extra_role_ids([instance.pk])[instance.pk]
+        instance.extra_role_ids = ','.join(role_ids)
+    elif action == 'post_clear':
+        sync_extra_role_ids(getattr(instance, '_cleared_members', []))
+    else:
+        sync_extra_role_ids(pk_set)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def publish_changed_user(sender, instance, **kwargs):
+    """
+    Убирает измененного или удаленного пользователя из LRU-кэшей
+    всех процессов после фиксации.
+    """
+    transaction.on_commit(partial(publish_user_change, instance.pk))
+
+
+@receiver(pre_delete, sender=Role)
+def remember_role_descendants(sender, instance, **kwargs):
+    """
+    Запоминает потомков удаляемой роли, которые теряют унаследованные
+    права, и пользователей, у которых роль была дополнительной.
+    """
+    instance._orphaned = descendants([instance.pk]) - {instance.pk}
+    instance._members = list(instance.members.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Role)
+def recompute_role_descendants(sender, instance, **kwargs):
+    """
+    Пересчитывает потомков удаленной роли, наборы ролей ее пользователей
+    и сбрасывает матрицу прав.
+    """
+    orphaned = getattr(instance, '_orphaned', None)
+    if orphaned:
+        recompute_roles(orphaned)
+    members = getattr(instance, '_members', None)
+    if members:
+        sync_extra_role_ids(members)
+    transaction.on_commit(permission_matrix.invalidate)
+
+
+@receiver(post_save, sender=BusinessElement)
+@receiver(post_delete, sender=BusinessElement)
+def invalidate_permission_matrix(sender, **kwargs):
+    """
+    Сбрасывает матрицу прав при изменении бизнес-элементов.
+    """
+    transaction.on_commit(permission_matrix.invalidate)
+
+
+def written_user_id(instance):
+    """
+    Пользователь, чьи сессия или профиль изменились при записи объекта.
+    """
+    if isinstance(instance, User):
+        return instance.pk
+    return getattr(instance, 'user_id', None)
+
+
+@receiver(post_save)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=AccessRule)
+@receiver(post_delete, sender=BusinessElement)
+def record_model_write(sender, instance, **kwargs):
+    """
+    Ставит метку read-your-writes после сохранения или удаления объекта.
+    post_delete подключен только к моделям, у которых уже есть
+    обработчики удаления, чтобы не отключать быстрое удаление сессий.
+    """
+    record_write(sender, written_user_id(instance))
+
+
+@receiver(m2m_changed)
+def record_relation_write(sender, instance, action, **kwargs):
+    """
+    Ставит метку read-your-writes после изменения связей ролей.
+    """
+    if action.startswith('post_'):
+        record_write(type(instance), written_user_id(instance))
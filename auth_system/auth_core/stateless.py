@@ -0,0 +1,247 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+
+DENYLIST_CACHE_PREFIX = 'auth_core:denylist:'
+GENERATION_CACHE_PREFIX = 'auth_core:session_generation:'
+USER_VERSION_CACHE_PREFIX = 'auth_core:user_version:'
+
+
+def decode_token(token, verify_exp=True):
+    """
+    Проверяет подпись JWT-токена и возвращает его полезную нагрузку.
+    Возвращает None, если токен невалиден.
+    """
+    try:
+        return jwt.decode(
+            token, settings.SECRET_KEY, algorithms=['HS256'],
+            options={'verify_exp': verify_exp}
+        )
+    except jwt.InvalidTokenError:
+        return None
+
+
+class TokenDenylist:
+    """
+    Список отозванных идентификаторов токенов (jti).
+    Хранится в общем кэше; каждая запись живет до истечения токена.
+    """
+
+    def revoke(self, jti, expires_at):
+        """
+        Отзывает токен до момента его истечения.
+        :param jti: Идентификатор токена
+        :param expires_at: Время истечения токена (unix timestamp)
+        """
+        if not jti:
+            return
+        timeout = max(int(expires_at - time.time()), 1)
+        cache.set(DENYLIST_CACHE_PREFIX + jti, True, timeout=timeout)
+
+    def revoke_token(self, token):
+        """
+        Отзывает токен по его строковому значению.
+        """
+        payload = decode_token(token, verify_exp=False)
+        if payload:
+            self.revoke(payload.get('jti'), payload.get('exp', 0))
+
+    def is_revoked(self, jti):
+        """
+        Проверяет, отозван ли токен.
+        """
+        return bool(jti) and cache.get(DENYLIST_CACHE_PREFIX + jti, False)
+
+
+class UserLRUCache:
+    """
+    Небольшой LRU-кэш активных пользователей в памяти процесса.
+    Записи живут не дольше AUTH_USER_CACHE_TTL секунд. Каждая запись
+    помечена версией пользователя из общего кэша (publish_user_change):
+    запись с другой версией считается устаревшей. Вызывающий получает
+    копию, а не общий экземпляр.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, version=None):
+        """
+        Возвращает активного пользователя из кэша или из базы данных.
+        :param version: Текущая версия пользователя из общего кэша
+        """
+        from .models import User
+
+        now = time.monotonic()
+        user = self._cached(user_id, now, version)
+        if user is not None:
+            return user
+        try:
+            user = User.objects.get(id=user_id, is_active=True)
+        except User.DoesNotExist:
+            self.evict(user_id)
+            return None
+        self.put(user, now, version)
+        return user
+
+    async def aget(self, user_id, version=None):
+        """
+        Асинхронный вариант get: промах кэша читается через async ORM.
+        """
+        from .models import User
+
+        now = time.monotonic()
+        user = self._cached(user_id, now, version)
+        if user is not None:
+            return user
+        try:
+            user = await User.objects.aget(id=user_id, is_active=True)
+        except User.DoesNotExist:
+            self.evict(user_id)
+            return None
+        self.put(user, now, version)
+        return user
+
+    def put(self, user, stored_at=None, version=None):
+        """
+        Кладет копию пользователя в кэш, вытесняя самые старые записи.
+        """
+        size = getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+        entry = (copy.copy(user), stored_at or time.monotonic(), version)
+        with self._lock:
+            self._entries[user.pk] = entry
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id):
+        """
+        Удаляет пользователя из кэша.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Очищает кэш."""
+        with self._lock:
+            self._entries.clear()
+
+    def _cached(self, user_id, now, version):
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if now - entry[1] >= ttl or entry[2] != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        return copy.copy(entry[0])
+
+
+token_denylist = TokenDenylist()
+user_cache = UserLRUCache()
+
+
+def publish_session_generation(user_id, generation):
+    """
+    Сообщает всем процессам новое поколение сессий пользователя.
+    Запись живет AUTH_USER_CACHE_TTL секунд: дольше устаревший
+    пользователь не держится ни в одном LRU-кэше.
+    """
+    user_cache.evict(user_id)
+    cache.set(
+        GENERATION_CACHE_PREFIX + str(user_id), generation,
+        timeout=getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+    )
+
+
+def publish_user_change(user_id):
+    """
+    Сообщает всем процессам, что пользователь изменился: записи с
+    прежней версией в их LRU-кэшах перестают использоваться.
+    """
+    user_cache.evict(user_id)
+    cache.set(
+        USER_VERSION_CACHE_PREFIX + str(user_id), uuid.uuid4().hex,
+        timeout=getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+    )
+
+
+def generation_revoked(generation, user, published=0):
+    """
+    Проверяет, отозвано ли поколение сессии или токена: пользователь
+    с тех пор увеличил поколение.
+    """
+    return generation < max(user.session_generation, published)
+
+
+def authenticate_token(token):
+    """
+    Аутентифицирует пользователя только по подписи и сроку токена,
+    без обращения к таблице сессий.
+    Возвращает пользователя или None.
+    """
+    payload = _token_payload(token)
+    if payload is None:
+        return None
+    return _current_user(
+        payload, user_cache.get(payload['user_id'], payload['user_version'])
+    )
+
+
+async def aauthenticate_token(token):
+    """
+    Асинхронный вариант authenticate_token.
+    """
+    payload = _token_payload(token)
+    if payload is None:
+        return None
+    return _current_user(
+        payload,
+        await user_cache.aget(payload['user_id'], payload['user_version'])
+    )
+
+
+def revocation_state(user_id, jti):
+    """
+    Возвращает тройку (отозван ли jti, опубликованное поколение сессий,
+    версия пользователя) одним запросом к кэшу.
+    """
+    generation_key = GENERATION_CACHE_PREFIX + str(user_id)
+    version_key = USER_VERSION_CACHE_PREFIX + str(user_id)
+    keys = [generation_key, version_key]
+    if jti:
+        keys.append(DENYLIST_CACHE_PREFIX + jti)
+    values = cache.get_many(keys)
+    revoked = len(keys) > 2 and bool(values.get(keys[2]))
+    return revoked, values.get(generation_key, 0), values.get(version_key)
+
+
+def _token_payload(token):
+    payload = decode_token(token)
+    if payload is None or 'user_id' not in payload:
+        return None
+    revoked, published, version = revocation_state(
+        payload['user_id'], payload.get('jti')
+    )
+    if revoked:
+        return None
+    payload['published_gen'] = published
+    payload['user_version'] = version
+    return payload
+
+
+def _current_user(payload, user):
+    if user is None or generation_revoked(
+        payload.get('gen', 0), user, payload['published_gen']
+    ):
+        return None
+    return user
@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from auth_core import db_routers
+from auth_core.models import User
+
+
+@mock.patch('auth_core.db_routers.replica_enabled', return_value=True)
+class ReadYourWritesTests(TestCase):
+    """
+    Метки read-your-writes ставятся только после настоящих записей.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'router@example.com', 'secret', first_name='Иван',
+            last_name='Петров'
+        )
+        self.token = db_routers.begin_request(self.user.pk)
+        self.state = db_routers._state.get()
+
+    def tearDown(self):
+        db_routers.finish_request(self.token)
+
+    def test_login_lookup_is_not_a_write(self, replica_enabled):
+        User.objects.get_for_login('router@example.com')
+        self.assertFalse(self.state.written)
+
+    def test_save_pins_user(self, replica_enabled):
+        self.user.first_name = 'Пётр'
+        self.user.save()
+        self.assertTrue(self.state.written)
+        self.assertEqual(self.state.written_users, {self.user.pk})
+
+    def test_session_revocation_pins_user(self, replica_enabled):
+        self.user.bump_session_generation()
+        self.assertEqual(self.state.written_users, {self.user.pk})
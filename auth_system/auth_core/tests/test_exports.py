@@ -0,0 +1,43 @@
+from unittest import mock
+
+from django.test import AsyncClient, Client, TestCase
+
+from auth_core.models import User
+from auth_core.session_store import get_session_store
+
+EXPORT_URL = '/api/export/users.ndjson'
+
+
+@mock.patch(
+    'auth_core.views.HasPermission.has_permission', return_value=True
+)
+class ExportViewTests(TestCase):
+    """
+    Потоковая выгрузка отдает синхронный итератор под WSGI и асинхронный
+    под ASGI.
+    """
+
+    def setUp(self):
+        for number in range(3):
+            user = User.objects.create_user(
+                f'export{number}@example.com', 'secret',
+                first_name='Иван', last_name='Петров'
+            )
+        token = get_session_store().create_for_login(user)
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def test_wsgi_streams_sync_iterator(self, has_permission):
+        response = Client().get(EXPORT_URL, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 3)
+
+    async def test_asgi_streams_async_iterator(self, has_permission):
+        response = await AsyncClient().get(EXPORT_URL, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        lines = b''.join(
+            [chunk async for chunk in response.streaming_content]
+        ).splitlines()
+        self.assertEqual(len(lines), 3)
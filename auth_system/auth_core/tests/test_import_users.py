@@ -0,0 +1,51 @@
+from django.test import TestCase
+
+from auth_core.hashing import hash_password
+from auth_core.management.commands.import_users import Command
+from auth_core.models import User
+
+
+class RacingPool:
+    """
+    Пул хеширования, во время работы которого параллельный импорт успевает
+    добавить пользователя с тем же email.
+    """
+
+    def map(self, func, passwords, *args, **kwargs):
+        User.objects.create_user(
+            'race@example.com', 'secret', first_name='Петр',
+            last_name='Иванов'
+        )
+        return [hash_password(password, 4) for password in passwords]
+
+
+class ImportChunkTests(TestCase):
+    """
+    Счетчики импорта пакета.
+    """
+
+    def setUp(self):
+        self.command = Command()
+        self.command.rounds = 4
+        self.command.workers = 1
+        User.objects.create_user(
+            'old@example.com', 'secret', first_name='Иван',
+            last_name='Петров'
+        )
+
+    def row(self, email):
+        return {
+            'email': email, 'password': 'secret', 'first_name': 'Иван',
+            'last_name': 'Петров',
+        }
+
+    def test_rows_skipped_by_conflict_are_not_counted_as_imported(self):
+        chunk = [
+            self.row('old@example.com'), self.row('new@example.com'),
+            self.row('race@example.com'),
+        ]
+        stats = self.command.import_chunk(chunk, 0, RacingPool())
+        self.assertEqual(
+            stats, {'imported': 1, 'existing': 2, 'invalid': 0}
+        )
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_core.models import User
+from auth_core.ratelimit import (
+    LocalCounterStore, LoginRateLimiter, arecord_failed_login,
+    record_failed_login
+)
+
+
+@override_settings(
+    AUTH_LOGIN_LOCKOUT_THRESHOLD=3, AUTH_LOGIN_LOCKOUT_BASE=60,
+    AUTH_LOGIN_LOCKOUT_MAX=3600
+)
+class LockoutTests(TestCase):
+    """
+    Блокировка пользователя после неудачных входов подряд.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'lockout@example.com', 'secret', first_name='Иван',
+            last_name='Петров'
+        )
+
+    def stored(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_user_is_locked_at_threshold(self):
+        for _ in range(2):
+            record_failed_login(self.user)
+        self.assertIsNone(self.stored().locked_until)
+        record_failed_login(self.user)
+        user = self.stored()
+        self.assertEqual(user.failed_login_attempts, 3)
+        self.assertGreater(user.locked_until, timezone.now())
+
+    def test_threshold_uses_stored_counter_not_stale_copy(self):
+        # Все неудачи приходят от копий, прочитанных до первой из них,
+        # как у параллельных запросов.
+        stale = User.objects.get(pk=self.user.pk)
+        for _ in range(3):
+            record_failed_login(stale)
+        self.assertEqual(stale.failed_login_attempts, 0)
+        self.assertIsNotNone(self.stored().locked_until)
+
+    async def test_async_failure_locks_user(self):
+        for _ in range(3):
+            await arecord_failed_login(self.user)
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertEqual(user.failed_login_attempts, 3)
+        self.assertIsNotNone(user.locked_until)
+
+    def test_failures_of_deleted_user_are_ignored(self):
+        User.objects.filter(pk=self.user.pk).delete()
+        record_failed_login(self.user)
+        self.assertFalse(User.objects.exists())
+
+
+@override_settings(AUTH_LOGIN_RATE_LIMITS={'email': (2, 60), 'ip': (1, 60)})
+class LoginRateLimiterTests(TestCase):
+    """
+    Лимиты попыток входа по email и IP.
+    """
+
+    def setUp(self):
+        self.limiter = LoginRateLimiter(LocalCounterStore())
+
+    def test_ip_blocked_attempts_do_not_consume_email_limit(self):
+        self.assertEqual(self.limiter.check('a@example.com', '10.0.0.1'), 0)
+        for _ in range(5):
+            self.assertGreater(
+                self.limiter.check('a@example.com', '10.0.0.1'), 0
+            )
+        # Владелец аккаунта с другого адреса входит, лимит email не исчерпан.
+        self.assertEqual(self.limiter.check('a@example.com', '10.0.0.2'), 0)
+
+    def test_email_limit_applies_across_addresses(self):
+        self.assertEqual(self.limiter.check('a@example.com', '10.0.0.1'), 0)
+        self.assertEqual(self.limiter.check('a@example.com', '10.0.0.2'), 0)
+        self.assertGreater(
+            self.limiter.check('a@example.com', '10.0.0.3'), 0
+        )
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from auth_core.hashing import HashingPoolBusy
+from auth_core.models import Session, User
+
+LOGIN_URL = '/api/auth/login/'
+
+
+@override_settings(AUTH_LOGIN_RATE_LIMITS={})
+class LoginTests(TestCase):
+    """
+    Вход: создание сессии и ответы для удаленных и заблокированных
+    пользователей.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            'login@example.com', 'secret', first_name='Иван',
+            last_name='Петров'
+        )
+
+    def login(self, password='secret'):
+        return self.client.post(
+            LOGIN_URL, {'email': 'login@example.com', 'password': password},
+            format='json'
+        )
+
+    def test_login_creates_session(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Session.objects.filter(user=self.user).exists())
+
+    def test_create_for_login_of_deleted_user_creates_no_session(self):
+        user = User.objects.get_for_login('login@example.com')
+        User.objects.filter(pk=user.pk).delete()
+        with self.assertRaises(User.DoesNotExist):
+            Session.objects.create_for_login(user)
+        self.assertFalse(Session.objects.exists())
+
+    def test_locked_account_is_hashed_like_unknown_email(self):
+        User.objects.filter(pk=self.user.pk).update(
+            locked_until=timezone.now() + timedelta(minutes=5)
+        )
+        with mock.patch.object(
+            User, 'check_dummy_password', return_value=False
+        ) as dummy:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        dummy.assert_called_once_with('secret')
+
+    def test_busy_hashing_pool_does_not_fail_rehash_on_login(self):
+        user = User.objects.get(pk=self.user.pk)
+        with mock.patch('auth_core.models.needs_rehash', return_value=True), \
+                mock.patch(
+                    'auth_core.models.hashing_pool.submit',
+                    side_effect=HashingPoolBusy('busy')
+                ) as submit:
+            self.assertTrue(user.check_password('secret'))
+        submit.assert_called_once()
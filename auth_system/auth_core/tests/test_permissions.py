@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from auth_core.models import (
+    AccessRule, BusinessElement, EffectivePermission, Role
+)
+from auth_core.permission_matrix import permission_matrix
+
+
+class PermissionRecomputeTests(TestCase):
+    """
+    Пересчет эффективных прав и матрицы при изменении правил.
+    """
+
+    def setUp(self):
+        cache.clear()
+        permission_matrix.invalidate()
+        self.manager = Role.objects.create(name='manager')
+        self.guest = Role.objects.create(name='guest')
+        self.products = BusinessElement.objects.create(name='goods')
+        self.orders = BusinessElement.objects.create(name='invoices')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule = AccessRule.objects.create(
+                role=self.manager, element=self.products,
+                read_permission=True
+            )
+
+    def assertCanRead(self, role, element, expected):
+        self.assertEqual(
+            permission_matrix.has_permission(
+                role.pk, element.name, 'read_permission'
+            ),
+            expected
+        )
+        self.assertEqual(
+            EffectivePermission.objects.filter(
+                role=role, element=element
+            ).exists(),
+            expected
+        )
+
+    def test_rule_grants_permission(self):
+        self.assertCanRead(self.manager, self.products, True)
+        self.assertCanRead(self.guest, self.products, False)
+
+    def test_moving_rule_to_another_role_revokes_old_role(self):
+        self.assertCanRead(self.manager, self.products, True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.role = self.guest
+            self.rule.save()
+        self.assertCanRead(self.manager, self.products, False)
+        self.assertCanRead(self.guest, self.products, True)
+
+    def test_moving_rule_to_another_element_revokes_old_element(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.element = self.orders
+            self.rule.save()
+        self.assertCanRead(self.manager, self.products, False)
+        self.assertCanRead(self.manager, self.orders, True)
+
+    def test_deleting_rule_revokes_permission(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.delete()
+        self.assertCanRead(self.manager, self.products, False)
+
+    def test_child_role_inherits_and_loses_parent_rule(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guest.parents.add(self.manager)
+        self.assertCanRead(self.guest, self.products, True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.role = Role.objects.create(name='auditor')
+            self.rule.save()
+        self.assertCanRead(self.guest, self.products, False)
+
+
+class PermissionMatrixPatchTests(TestCase):
+    """
+    Точечное обновление матрицы прав после пересчета.
+    """
+
+    def setUp(self):
+        cache.clear()
+        permission_matrix.invalidate()
+        self.role = Role.objects.create(name='editor')
+        self.other = Role.objects.create(name='viewer')
+        self.products = BusinessElement.objects.create(name='goods')
+        self.orders = BusinessElement.objects.create(name='invoices')
+        with self.captureOnCommitCallbacks(execute=True):
+            AccessRule.objects.create(
+                role=self.role, element=self.products, read_permission=True
+            )
+
+    def test_apply_roles_replaces_all_masks_of_role(self):
+        self.assertTrue(permission_matrix.get_mask(self.role.pk, 'goods'))
+        permission_matrix.apply_roles({self.role.pk: {self.orders.pk: 1}})
+        self.assertEqual(permission_matrix.get_mask(self.role.pk, 'goods'), 0)
+        self.assertEqual(
+            permission_matrix.get_mask(self.role.pk, 'invoices'), 1
+        )
+
+    def test_apply_roles_clears_role_without_rules(self):
+        self.assertTrue(permission_matrix.get_mask(self.role.pk, 'goods'))
+        permission_matrix.apply_roles({self.role.pk: {}})
+        masks = permission_matrix.role_masks(self.role.pk)
+        self.assertFalse(any(masks.values()))
+
+    def test_apply_roles_drops_merged_role_sets(self):
+        role_set = frozenset({self.role.pk, self.other.pk})
+        self.assertTrue(permission_matrix.get_mask(role_set, 'goods'))
+        permission_matrix.apply_roles({self.role.pk: {}})
+        self.assertEqual(permission_matrix.get_mask(role_set, 'goods'), 0)
@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from auth_core.models import Session, User
+from auth_core.session_store import SESSION_CACHE_PREFIX, get_session_store
+from auth_core.stateless import authenticate_token, token_denylist, user_cache
+
+LOGOUT_URL = '/api/auth/logout/'
+LOGOUT_ALL_URL = '/api/auth/logout_all/'
+PROTECTED_URL = '/api/mock/users/'
+
+
+class SessionRevocationMixin:
+    """
+    Отзыв сессий, общий для всех хранилищ: выход завершает одну сессию,
+    logout_all и delete_for_user — все сессии пользователя.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.store = get_session_store()
+        self.user = User.objects.create_user(
+            'session@example.com', 'secret', first_name='Иван',
+            last_name='Петров'
+        )
+
+    def authenticate(self, token):
+        return self.store.authenticate(token)
+
+    def get(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.get(PROTECTED_URL)
+
+    def post(self, url, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.post(url)
+
+    def test_token_authenticates_user(self):
+        token = self.store.create_for_login(self.user)
+        self.assertEqual(self.authenticate(token).pk, self.user.pk)
+        self.assertEqual(self.get(token).status_code, 200)
+
+    def test_logout_revokes_only_its_token(self):
+        token = self.store.create_for_login(self.user)
+        other = self.store.create_for_login(self.user)
+        self.assertEqual(self.post(LOGOUT_URL, token).status_code, 200)
+        self.assertIsNone(self.authenticate(token))
+        self.assertEqual(self.get(token).status_code, 403)
+        self.assertEqual(self.authenticate(other).pk, self.user.pk)
+
+    def test_logout_all_revokes_every_token(self):
+        tokens = [self.store.create_for_login(self.user) for _ in range(2)]
+        self.assertEqual(self.post(LOGOUT_ALL_URL, tokens[0]).status_code, 200)
+        for token in tokens:
+            self.assertIsNone(self.authenticate(token))
+            self.assertEqual(self.get(token).status_code, 403)
+        self.assertEqual(
+            User.objects.get(pk=self.user.pk).session_generation, 1
+        )
+
+    def test_login_after_delete_for_user_gets_new_generation(self):
+        old = self.store.create_for_login(self.user)
+        self.store.delete_for_user(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        token = self.store.create_for_login(user)
+        self.assertIsNone(self.authenticate(old))
+        self.assertEqual(self.authenticate(token).pk, self.user.pk)
+
+
+@override_settings(AUTH_SESSION_STORE='auth_core.session_store.DBSessionStore')
+class DBSessionStoreTests(SessionRevocationMixin, TestCase):
+    pass
+
+
+@override_settings(
+    AUTH_SESSION_STORE='auth_core.session_store.CacheSessionStore'
+)
+class CacheSessionStoreTests(SessionRevocationMixin, TestCase):
+    pass
+
+
+@override_settings(
+    AUTH_SESSION_STORE='auth_core.session_store.HybridSessionStore',
+    AUTH_SESSION_PERSIST_INTERVAL=0
+)
+class HybridSessionStoreTests(SessionRevocationMixin, TestCase):
+
+    def test_session_is_restored_from_database_on_cache_miss(self):
+        token = self.store.create_for_login(self.user)
+        cache.delete(SESSION_CACHE_PREFIX + Session.hash_token(token))
+        self.assertEqual(self.authenticate(token).pk, self.user.pk)
+
+    def test_revoked_session_is_not_restored_from_database(self):
+        # Выход в другом процессе: jti отозван, а строка Session еще не
+        # удалена его очередью записи.
+        token = self.store.create_for_login(self.user)
+        token_denylist.revoke_token(token)
+        cache.delete(SESSION_CACHE_PREFIX + Session.hash_token(token))
+        self.assertTrue(Session.objects.exists())
+        self.assertIsNone(self.authenticate(token))
+
+
+@override_settings(AUTH_STATELESS_TOKENS=True)
+class StatelessTokenTests(SessionRevocationMixin, TestCase):
+
+    def authenticate(self, token):
+        return authenticate_token(token)
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from auth_core.models import Role, User
+
+
+class UserSaveTests(TestCase):
+    """
+    Полное сохранение устаревшего экземпляра пользователя.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'stale@example.com', 'secret', first_name='Иван',
+            last_name='Петров'
+        )
+        self.role = Role.objects.create(name='support')
+
+    def test_stale_save_keeps_extra_roles(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.user.roles.add(self.role)
+        stale.first_name = 'Пётр'
+        stale.save()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.first_name, 'Пётр')
+        self.assertEqual(user.extra_role_ids, str(self.role.pk))
+        self.assertIn(self.role.pk, user.role_ids)
+
+    def test_stale_save_keeps_session_generation(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.user.bump_session_generation()
+        stale.save()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.session_generation, 1)
@@ -2,6 +2,11 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import AuthViewSet, RoleViewSet, BusinessElementViewSet, AccessRuleViewSet
 from .views import mock_users_view, mock_products_view, mock_orders_view
+from .views import (
+    audit_metrics_view, hashing_metrics_view, request_metrics_view
+)
+from .views import export_view, permission_map_view
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'auth', AuthViewSet, basename='auth')
@@ -11,7 +16,21 @@ router.register(r'rules', AccessRuleViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('permissions/', permission_map_view),
+    path('export/<str:name>.<str:file_format>', export_view),
     path('mock/users/', mock_users_view),
     path('mock/products/', mock_products_view),
     path('mock/orders/', mock_orders_view),
-]
\ No newline at end of file
+    path('async/auth/register/', async_views.register_view),
+    path('async/auth/login/', async_views.login_view),
+    path('async/auth/logout/', async_views.logout_view),
+    path('async/auth/logout_all/', async_views.logout_all_view),
+    path('async/auth/update_profile/', async_views.update_profile_view),
+    path('async/auth/delete_account/', async_views.delete_account_view),
+    path('async/mock/users/', async_views.mock_users_view),
+    path('async/mock/products/', async_views.mock_products_view),
+    path('async/mock/orders/', async_views.mock_orders_view),
+    path('metrics/hashing/', hashing_metrics_view),
+    path('metrics/requests/', request_metrics_view),
+    path('metrics/audit/', audit_metrics_view),
+]
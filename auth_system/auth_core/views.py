@@ -1,16 +1,40 @@
+import hashlib
+import json
+
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.utils import timezone
-from datetime import timedelta
-from .models import User, Session, Role, BusinessElement, AccessRule
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (
+    SAFE_METHODS, AllowAny, IsAdminUser, IsAuthenticated
+)
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from .audit import audit_log
+from .db_routers import record_write
+from .exports import EXPORTS, FORMATS, aexport_lines, export_lines
+from .hierarchy import recompute_roles
+from .hashing import hashing_pool
+from .instrumentation import registry
+from .models import User, Role, BusinessElement, AccessRule
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer,
     UserUpdateSerializer, RoleSerializer,
-    BusinessElementSerializer, AccessRuleSerializer
+    BusinessElementSerializer, AccessRuleSerializer,
+    PermissionCheckSerializer, BulkRoleSerializer,
+    BulkBusinessElementSerializer, BulkAccessRuleSerializer
+)
+from .pagination import IdCursorPagination
+from .permission_matrix import PERMISSION_TYPES, permission_matrix
+from .permissions import (
+    CanManageAccessRules, HasPermission, get_permission_map
 )
-from .permissions import CanManageAccessRules
+from .ratelimit import (
+    THROTTLED_MESSAGE, client_ip, get_login_rate_limiter, lockout_remaining,
+    record_failed_login, retry_after_header
+)
+from .session_store import get_session_store
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -37,25 +61,52 @@ class AuthViewSet(viewsets.ViewSet):
     def login(self, request):
         """
         Аутентифицирует пользователя и создает сессию.
+        Попытки ограничиваются по email и IP до поиска пользователя;
+        после серии неудач пользователь временно блокируется.
         """
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
-            try:
-                user = User.objects.get(
-                    email=serializer.validated_data['email'], is_active=True
+            email = serializer.validated_data['email']
+            ip = client_ip(request)
+            limiter = get_login_rate_limiter()
+            retry_after = limiter.check(email, ip)
+            if retry_after:
+                audit_log.record(
+                    'login', allowed=False, ip=ip, detail=f'throttled:{email}'
                 )
-                if user.check_password(serializer.validated_data['password']):
-                    token = user.generate_token()
-                    Session.objects.create(
-                        user=user,
-                        token=token,
-                        expires_at=timezone.now() + timedelta(days=7)
-                    )
-                    return Response(
-                        {'token': token}, status=status.HTTP_200_OK
+                return self._throttled(retry_after)
+            password = serializer.validated_data['password']
+            user = User.objects.get_for_login(email)
+            if user is None:
+                User.check_dummy_password(password)
+            else:
+                retry_after = lockout_remaining(user)
+                if retry_after:
+                    # Хеш считается и здесь, чтобы по времени ответа нельзя
+                    # было отличить заблокированный аккаунт.
+                    User.check_dummy_password(password)
+                    audit_log.record(
+                        'login', user.pk, False, ip=ip, detail='locked'
                     )
-            except User.DoesNotExist:
-                pass
+                    return self._throttled(retry_after)
+                if user.check_password(password):
+                    limiter.reset(email)
+                    try:
+                        token = get_session_store().create_for_login(user)
+                    except User.DoesNotExist:
+                        # Пользователя удалили между поиском и входом.
+                        token = None
+                    if token is not None:
+                        audit_log.record('login', user.pk, True, ip=ip)
+                        return Response(
+                            {'token': token}, status=status.HTTP_200_OK
+                        )
+                else:
+                    record_failed_login(user)
+            audit_log.record(
+                'login', getattr(user, 'pk', None), False, ip=ip,
+                detail=f'invalid:{email}'
+            )
             return Response(
                 {'error': 'Неверные учетные данные'},
                 status=status.HTTP_401_UNAUTHORIZED
@@ -64,6 +115,15 @@ class AuthViewSet(viewsets.ViewSet):
             serializer.errors, status=status.HTTP_400_BAD_REQUEST
         )
 
+    @staticmethod
+    def _throttled(retry_after):
+        response = Response(
+            {'error': THROTTLED_MESSAGE},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = retry_after_header(retry_after)
+        return response
+
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def logout(self, request):
         """
@@ -72,9 +132,23 @@ class AuthViewSet(viewsets.ViewSet):
         auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
-            Session.objects.filter(token=token).delete()
+            get_session_store().delete(token)
+        audit_log.record('logout', request.user.pk, ip=client_ip(request))
         return Response({'message': 'Успешный выход'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def logout_all(self, request):
+        """
+        Завершает все сессии пользователя на всех устройствах.
+        """
+        get_session_store().delete_for_user(request.user)
+        audit_log.record(
+            'logout', request.user.pk, ip=client_ip(request), detail='all'
+        )
+        return Response(
+            {'message': 'Все сессии завершены'}, status=status.HTTP_200_OK
+        )
+
     @action(detail=False, methods=['put'], permission_classes=[IsAuthenticated])
     def update_profile(self, request):
         """
@@ -99,35 +173,284 @@ class AuthViewSet(viewsets.ViewSet):
         """
         request.user.is_active = False
         request.user.save()
-        Session.objects.filter(user=request.user).delete()
+        get_session_store().delete_for_user(request.user)
         return Response({'message': 'Аккаунт удален'}, status=status.HTTP_200_OK)
 
 
-class RoleViewSet(viewsets.ModelViewSet):
+class BulkUpsertMixin:
+    """
+    Добавляет во ViewSet эндпоинт POST bulk/ для массового создания и
+    обновления объектов одним запросом.
+    Объекты сопоставляются по bulk_unique_fields; у существующих
+    обновляются bulk_update_fields. Все изменения выполняются в одной
+    транзакции, ответ содержит результат по каждому элементу.
+    """
+    bulk_serializer_class = None
+    bulk_unique_fields = ()
+    bulk_update_fields = ()
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Массово создает или обновляет объекты.
+        """
+        if not isinstance(request.data, list):
+            return Response(
+                {'error': 'Ожидается массив объектов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        model = self.get_queryset().model
+        context = {'request': request, 'bulk_items': request.data}
+        results = []
+        objects = []
+        keys = []
+        has_errors = False
+        for index, item in enumerate(request.data):
+            serializer = self.bulk_serializer_class(data=item, context=context)
+            if not serializer.is_valid():
+                has_errors = True
+                results.append({
+                    'index': index, 'status': 'invalid',
+                    'errors': serializer.errors
+                })
+                continue
+            obj = model(**serializer.validated_data)
+            key = self._bulk_key(obj)
+            if key in keys:
+                has_errors = True
+                results.append({
+                    'index': index, 'status': 'invalid',
+                    'errors': {'non_field_errors': ['Повторяющийся объект']}
+                })
+                continue
+            keys.append(key)
+            objects.append(obj)
+            results.append({'index': index, 'status': 'valid'})
+        if has_errors:
+            return Response(
+                {'results': results}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            existing = self._bulk_existing_keys(model, objects)
+            model.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=self.bulk_unique_fields,
+                update_fields=self.bulk_update_fields
+            )
+            self.bulk_saved(objects)
+            record_write(model)
+            transaction.on_commit(permission_matrix.invalidate)
+
+        for result, obj, key in zip(results, objects, keys):
+            result['status'] = 'updated' if key in existing else 'created'
+            result['id'] = obj.pk
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def bulk_saved(self, objects):
+        """
+        Вызывается в транзакции после массовой записи: bulk_create не
+        отправляет сигналы, поэтому производные данные обновляются здесь.
+        """
+
+    def _bulk_key(self, obj):
+        field_names = [
+            obj._meta.get_field(name).attname
+            for name in self.bulk_unique_fields
+        ]
+        return tuple(getattr(obj, name) for name in field_names)
+
+    def _bulk_existing_keys(self, model, objects):
+        field_names = [
+            model._meta.get_field(name).attname
+            for name in self.bulk_unique_fields
+        ]
+        lookup = {
+            f'{name}__in': {getattr(obj, name) for obj in objects}
+            for name in field_names
+        }
+        return set(
+            model.objects.filter(**lookup).values_list(*field_names)
+        ) if objects else set()
+
+
+class ProjectionMixin:
+    """
+    Добавляет в чтение ViewSet проекцию полей ?fields=id,name, которая
+    сужает SELECT через only(), и раскрытие связей ?expand=role,element
+    через select_related.
+    """
+    pagination_class = IdCursorPagination
+
+    def get_projection(self):
+        """
+        Возвращает пару (поля, раскрываемые связи) из параметров запроса.
+        """
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None, ()
+        serializer_class = self.get_serializer_class()
+        available = set(serializer_class().fields)
+        fields = self.request.query_params.get('fields')
+        if fields:
+            fields = [name for name in fields.split(',') if name]
+            unknown = set(fields) - available
+            if unknown:
+                raise ValidationError(
+                    {'fields': f"Неизвестные поля: {', '.join(sorted(unknown))}"}
+                )
+        expand = [
+            name
+            for name in self.request.query_params.get('expand', '').split(',')
+            if name in serializer_class.expandable_fields
+            and (not fields or name in fields)
+        ]
+        return fields or None, expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_projection()
+        if fields:
+            concrete = {
+                field.name for field in queryset.model._meta.concrete_fields
+            }
+            queryset = queryset.only(
+                'id', *(name for name in fields if name in concrete)
+            )
+        if expand:
+            queryset = queryset.select_related(*expand)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_projection()
+        kwargs.setdefault('fields', fields)
+        kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+
+class RoleViewSet(ProjectionMixin, BulkUpsertMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления ролями пользователей.
     """
-    queryset = Role.objects.all()
+    queryset = Role.objects.prefetch_related('parents')
     serializer_class = RoleSerializer
     permission_classes = (IsAuthenticated, CanManageAccessRules)
+    bulk_serializer_class = BulkRoleSerializer
+    bulk_unique_fields = ('name',)
+    bulk_update_fields = ('description',)
+
+    def bulk_saved(self, objects):
+        recompute_roles({role.pk for role in objects})
 
 
-class BusinessElementViewSet(viewsets.ModelViewSet):
+class BusinessElementViewSet(
+    ProjectionMixin, BulkUpsertMixin, viewsets.ModelViewSet
+):
     """
     ViewSet для управления бизнес-элементами.
     """
     queryset = BusinessElement.objects.all()
     serializer_class = BusinessElementSerializer
     permission_classes = (IsAuthenticated, CanManageAccessRules)
+    bulk_serializer_class = BulkBusinessElementSerializer
+    bulk_unique_fields = ('name',)
+    bulk_update_fields = ('description',)
 
 
-class AccessRuleViewSet(viewsets.ModelViewSet):
+class AccessRuleViewSet(
+    ProjectionMixin, BulkUpsertMixin, viewsets.ModelViewSet
+):
     """
     ViewSet для управления правилами доступа.
     """
     queryset = AccessRule.objects.all()
     serializer_class = AccessRuleSerializer
     permission_classes = (IsAuthenticated, CanManageAccessRules)
+    bulk_serializer_class = BulkAccessRuleSerializer
+    bulk_unique_fields = ('role', 'element')
+    bulk_update_fields = PERMISSION_TYPES
+
+    def bulk_saved(self, objects):
+        recompute_roles(
+            {rule.role_id for rule in objects}, hierarchy_changed=False
+        )
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def permission_map_view(request):
+    """
+    Возвращает карту эффективных прав текущего пользователя.
+    GET принимает параметры elements и actions через запятую,
+    POST — тело {"checks": [["users", "read"], ...]} или {"checks": "all"}.
+    Поддерживает ETag и If-None-Match.
+    """
+    if request.method == 'GET':
+        data = {
+            key: request.query_params[key].split(',')
+            for key in ('elements', 'actions')
+            if request.query_params.get(key)
+        }
+    else:
+        if not isinstance(request.data, dict):
+            return Response(
+                {'error': 'Ожидается объект'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = dict(request.data)
+        if data.get('checks') == 'all':
+            data.pop('checks')
+    serializer = PermissionCheckSerializer(data=data)
+    if not serializer.is_valid():
+        return Response(
+            serializer.errors, status=status.HTTP_400_BAD_REQUEST
+        )
+    permissions = get_permission_map(request.user, **serializer.validated_data)
+    body = {
+        'role': request.user.role_id,
+        'roles': sorted(request.user.role_ids),
+        'permissions': permissions,
+    }
+    etag = '"{}"'.format(hashlib.sha1(
+        json.dumps(body, sort_keys=True).encode('utf-8')
+    ).hexdigest())
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(body)
+    response['ETag'] = etag
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_view(request, name, file_format):
+    """
+    Потоковая выгрузка users, sessions или rules в NDJSON или CSV.
+    Требует права read_all на соответствующий бизнес-элемент.
+    """
+    if name not in EXPORTS or file_format not in FORMATS:
+        raise Http404
+    permission = HasPermission(EXPORTS[name]['element'], 'read_all_permission')
+    if not permission.has_permission(request, None):
+        return Response(
+            {'error': 'Недостаточно прав для выгрузки'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    # Под ASGI синхронный генератор буферизуется целиком, поэтому
+    # отдаем асинхронный итератор.
+    if isinstance(request._request, ASGIRequest):
+        lines = aexport_lines(name, file_format)
+    else:
+        lines = export_lines(name, file_format)
+    response = StreamingHttpResponse(
+        lines, content_type=FORMATS[file_format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{file_format}"'
+    )
+    return response
 
 
 @api_view(['GET'])
@@ -161,3 +484,30 @@ def mock_orders_view(request):
     elif request.method == 'PUT':
         return Response({'data': 'Заказ обновлен'})
     return Response({'data': 'Заказ удален'})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def hashing_metrics_view(request):
+    """
+    Метрики пула хеширования паролей (глубина очереди, отказы).
+    """
+    return Response(hashing_pool.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def audit_metrics_view(request):
+    """
+    Состояние буфера аудита (в очереди, записано, потеряно).
+    """
+    return Response(audit_log.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_metrics_view(request):
+    """
+    Гистограммы замеров запросов (SQL, аутентификация, права, хеширование).
+    """
+    return Response(registry.snapshot())
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,6 +23,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "auth_core.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -29,6 +31,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "auth_core.middleware.ReadYourWritesMiddleware",
     "auth_core.middleware.CustomAuthenticationMiddleware",
 ]
 
@@ -52,12 +55,103 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "auth_system.wsgi.application"
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Профиль базы данных задается переменными окружения:
+# DB_ENGINE=postgres включает PostgreSQL (DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST, DB_PORT), иначе используется SQLite (DB_NAME — путь к файлу).
+# DB_REPLICA_HOST (PostgreSQL) или DB_REPLICA_NAME (SQLite) добавляет
+# реплику для чтения, куда роутер отправляет чтения пути аутентификации.
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "auth_system"),
+            "USER": os.environ.get("DB_USER", "postgres"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # Постоянные соединения вместо нового подключения на запрос.
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "connect_timeout": int(
+                    os.environ.get("DB_CONNECT_TIMEOUT", "5")
+                ),
+            },
+        }
     }
-}
+    if os.environ.get("DB_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": os.environ["DB_REPLICA_HOST"],
+            "PORT": os.environ.get(
+                "DB_REPLICA_PORT", DATABASES["default"]["PORT"]
+            ),
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    SQLITE_OPTIONS = {
+        # WAL позволяет читать параллельно с записью; IMMEDIATE берет
+        # блокировку записи в начале транзакции, а не при первой записи.
+        "init_command": (
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA busy_timeout=5000;"
+            "PRAGMA cache_size=-20000;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA mmap_size=134217728;"
+        ),
+        "transaction_mode": "IMMEDIATE",
+    }
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": SQLITE_OPTIONS,
+        }
+    }
+    if os.environ.get("DB_REPLICA_NAME"):
+        DATABASES["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ["DB_REPLICA_NAME"],
+            "OPTIONS": SQLITE_OPTIONS,
+            "TEST": {"MIRROR": "default"},
+        }
+
+if "replica" in DATABASES:
+    DATABASE_ROUTERS = ["auth_core.db_routers.AuthReplicaRouter"]
+
+# Кэш хранит состояние, общее для всех процессов: поколение матрицы прав,
+# отозванные jti, метки read-your-writes и поколения сессий. CACHE_BACKEND:
+# redis (REDIS_URL), file (CACHE_DIR, процессы одного сервера) или locmem
+# (по умолчанию, только для одного процесса).
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_URL", "redis://localhost:6379/0"),
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CACHE_DIR", BASE_DIR / "cache"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Количество процессов сервера (gunicorn читает ту же переменную). Больше
+# одного процесса требует общего кэша, это проверяет auth_core.E001.
+AUTH_WORKERS = int(os.environ.get("WEB_CONCURRENCY", "1"))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -94,3 +188,64 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
 }
+
+AUTH_PAGE_SIZE = 100
+
+AUTH_SESSION_REFRESH_FRACTION = 0.1
+
+AUTH_LAST_LOGIN_FLUSH_INTERVAL = 30
+
+AUTH_STATELESS_TOKENS = False
+
+AUTH_USER_CACHE_SIZE = 1024
+
+AUTH_USER_CACHE_TTL = 60
+
+AUTH_HASHING_WORKERS = 4
+
+AUTH_HASHING_QUEUE_SIZE = 64
+
+AUTH_BCRYPT_ROUNDS = 12
+
+AUTH_SESSION_REAPER_INTERVAL = None
+
+AUTH_SESSION_REAPER_BATCH_SIZE = 1000
+
+AUTH_SESSION_STORE = "auth_core.session_store.DBSessionStore"
+
+AUTH_SESSION_CACHE_ALIAS = "default"
+
+AUTH_SESSION_PERSIST_INTERVAL = 1
+
+AUTH_INSTRUMENTATION_SAMPLE_RATE = 0.0
+
+AUTH_INSTRUMENTATION_LOG_INTERVAL = 60
+
+AUTH_EXPORT_CHUNK_SIZE = 2000
+
+AUTH_LOGIN_RATE_LIMITS = {
+    "email": (5, 60),
+    "ip": (50, 60),
+}
+
+AUTH_LOGIN_RATE_LIMIT_STORE = "auth_core.ratelimit.LocalCounterStore"
+
+AUTH_LOGIN_RATE_LIMIT_CACHE_ALIAS = "default"
+
+AUTH_LOGIN_LOCKOUT_THRESHOLD = 10
+
+AUTH_LOGIN_LOCKOUT_BASE = 60
+
+AUTH_LOGIN_LOCKOUT_MAX = 3600
+
+AUTH_DB_STICKY_SECONDS = 5
+
+AUTH_AUDIT_SINK = "auth_core.audit.DatabaseAuditSink"
+
+AUTH_AUDIT_LOG_PATH = BASE_DIR / "audit.jsonl"
+
+AUTH_AUDIT_BUFFER_SIZE = 10000
+
+AUTH_AUDIT_FLUSH_SIZE = 500
+
+AUTH_AUDIT_FLUSH_INTERVAL = 1